@@ -0,0 +1,38 @@
+import argparse
+
+from stories.runner import build_chains, find_outputs, run
+
+parser = argparse.ArgumentParser(
+    prog="python -m stories", description="Regenerate the story outputs."
+)
+parser.add_argument(
+    "outputs", nargs="*", help="Only run outputs whose name contains one of these."
+)
+parser.add_argument(
+    "-w", "--workers", type=int, default=None, help="Number of processes."
+)
+parser.add_argument(
+    "--list", action="store_true", help="List the output chains and exit."
+)
+parser.add_argument(
+    "-f", "--force", action="store_true", help="Rebuild up-to-date outputs too."
+)
+parser.add_argument(
+    "-p",
+    "--profile",
+    action="store_true",
+    help="Record the time, rows and memory of every stage (see output/profiles).",
+)
+
+args = parser.parse_args()
+
+if args.list:
+    for i, chain in enumerate(build_chains(find_outputs()), start=1):
+        print(f"Chain {i}:\n" + "\n".join(f"  {output}" for output in chain))
+else:
+    run(
+        only=args.outputs,
+        workers=args.workers,
+        force=args.force,
+        profile=args.profile,
+    )
@@ -1,56 +1,63 @@
 import pandas as pd
 
-from oda_data import ODAData, set_data_path
-from stories.config import Paths, logger
-
-# Set path to store the raw oda data
-set_data_path(Paths.raw_data)
-
-
-def get_total_flows(start_year: int = 1960, end_year: int = 2023) -> pd.DataFrame:
-    """Get the total net ODA flows to Africa and Developing countries from the G7 countries."""
-
-    # Oda object
-    oda = ODAData(years=range(start_year, end_year), include_names=True)
-
-    # Load the indicator
-    oda.load_indicator("recipient_total_flow_net")
-
-    # Get the data
-    return oda.get_data()
-
-
-def filter_africa_total(df: pd.DataFrame) -> pd.DataFrame:
-    return df.query("recipient_code.isin([10001])")
-
-
-def filter_dev_countries(df: pd.DataFrame) -> pd.DataFrame:
-    return df.query("recipient_code.isin([10100])")
-
-
-def filter_g7_countries(df: pd.DataFrame) -> pd.DataFrame:
-    return df.query("donor_code == 20003")
-
-
-def filter_dac_countries(df: pd.DataFrame) -> pd.DataFrame:
-    return df.query("donor_code == 20001")
+from stories.dac_cache import planned_download_dac2a
+
+# Donor and recipient codes used in this story
+G7: str = "G7"
+DAC: str = "DAC"
+AFRICA: str = "F"
+DEVELOPING_COUNTRIES: str = "DPGC"
+
+# Imputed multilateral and bilateral net ODA, which add up to total net flows
+MEASURES: list[str] = ["106", "206"]
+
+# Every DAC2A slice used in this story, fetched with one query
+DAC2A_PLAN: list[dict] = [
+    {
+        "donor": [G7, DAC],
+        "recipient": [AFRICA, DEVELOPING_COUNTRIES],
+        "measure": MEASURES,
+        "price_base": "V",
+    }
+]
+
+
+def get_total_flows(
+    donors: list[str] | None = None,
+    recipients: list[str] | None = None,
+    start_year: int = 1960,
+    end_year: int = 2023,
+) -> pd.DataFrame:
+    """Get the total net ODA flows from the donors (G7 and DAC by default) to the
+    recipients (Africa and Developing countries by default).
+
+    The donor and recipient filters are part of the DAC2A query, so only those
+    series are downloaded and read."""
+    filters = {
+        "donor": donors or [G7, DAC],
+        "recipient": recipients or [AFRICA, DEVELOPING_COUNTRIES],
+        "measure": MEASURES,
+        "price_base": "V",
+    }
+
+    df = planned_download_dac2a(filters, plan=DAC2A_PLAN, start_year=start_year)
+
+    return (
+        df.loc[lambda d: d.year < end_year]
+        .groupby(
+            ["year", "donor_code", "donor_name", "recipient_code", "recipient_name"],
+            as_index=False,
+            dropna=False,
+        )["value"]
+        .sum()
+    )
 
 
 def share_to_africa(g7_only: bool = True) -> pd.DataFrame:
     """Get the share of ODA to Africa from the total ODA to developing countries."""
 
     # Get indicator data
-    df = get_total_flows()
-
-    if g7_only:
-        df = df.pipe(filter_g7_countries)
-    else:
-        df = df.pipe(filter_dac_countries)
-
-    africa = df.pipe(filter_africa_total)
-    dev_countries = df.pipe(filter_dev_countries)
-
-    df = pd.concat([africa, dev_countries], ignore_index=True).filter(
+    df = get_total_flows(donors=[G7] if g7_only else [DAC]).filter(
         ["year", "donor_name", "recipient_name", "value"]
     )
 
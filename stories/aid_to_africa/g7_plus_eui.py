@@ -1,33 +1,45 @@
 import pandas as pd
-from oda_reader import download_dac2a, download_dac1
 
 from stories.config import Paths
+from stories.dac_cache import (
+    planned_download_dac1,
+    planned_download_dac2a,
+    log_run_cache_stats,
+)
+from stories.recipient_shares import recipient_shares
 
 START: int = 1960
+AFRICA: str = "F"
+
+# Every DAC2A/DAC1 slice used in this story, fetched with one query per dataflow
+DAC2A_PLAN: list[dict] = [
+    {
+        "donor": ["G7", "4EU001"],
+        "recipient": ["F", "DPGC"],
+        "measure": ["106", "206"],
+        "price_base": "V",
+    }
+]
+DAC1_PLAN: list[dict] = [
+    {
+        "donor": ["G7", "DAC", "WXDAC"],
+        "flow_type": "1120",
+        "measure": "2102",
+        "price_base": "V",
+    }
+]
 
 
 def download_eui_africa_bilateral():
 
     filters = {"donor": "4EU001", "recipient": "F", "measure": "206", "price_base": "V"}
-    return download_dac2a(start_year=START, filters=filters)
+    return planned_download_dac2a(filters, plan=DAC2A_PLAN, start_year=START)
 
 
 def download_eui_africa_multi():
 
     filters = {"donor": "4EU001", "recipient": "F", "measure": "106", "price_base": "V"}
-    return download_dac2a(start_year=START, filters=filters)
-
-
-def download_g7_africa_bilateral():
-
-    filters = {"donor": "G7", "recipient": "F", "measure": "206", "price_base": "V"}
-    return download_dac2a(start_year=START, filters=filters)
-
-
-def download_g7_africa_multi():
-
-    filters = {"donor": "G7", "recipient": "F", "measure": "106", "price_base": "V"}
-    return download_dac2a(start_year=START, filters=filters)
+    return planned_download_dac2a(filters, plan=DAC2A_PLAN, start_year=START)
 
 
 def download_eui_all_bilateral():
@@ -38,7 +50,7 @@ def download_eui_all_bilateral():
         "measure": "206",
         "price_base": "V",
     }
-    return download_dac2a(start_year=START, filters=filters)
+    return planned_download_dac2a(filters, plan=DAC2A_PLAN, start_year=START)
 
 
 def download_eui_all_multi():
@@ -49,24 +61,12 @@ def download_eui_all_multi():
         "measure": "106",
         "price_base": "V",
     }
-    return download_dac2a(start_year=START, filters=filters)
-
-
-def download_g7_all_bilateral():
-
-    filters = {"donor": "G7", "recipient": "DPGC", "measure": "206", "price_base": "V"}
-    return download_dac2a(start_year=START, filters=filters)
-
-
-def download_g7_all_multi():
-
-    filters = {"donor": "G7", "recipient": "DPGC", "measure": "106", "price_base": "V"}
-    return download_dac2a(start_year=START, filters=filters)
+    return planned_download_dac2a(filters, plan=DAC2A_PLAN, start_year=START)
 
 
 def download_g7_eui():
     filters = {"donor": "G7", "flow_type": "1120", "measure": "2102", "price_base": "V"}
-    return download_dac1(start_year=START, filters=filters)
+    return planned_download_dac1(filters, plan=DAC1_PLAN, start_year=START)
 
 
 def download_all_official_eui():
@@ -76,7 +76,7 @@ def download_all_official_eui():
         "measure": "2102",
         "price_base": "V",
     }
-    return download_dac1(start_year=START, filters=filters)
+    return planned_download_dac1(filters, plan=DAC1_PLAN, start_year=START)
 
 
 def yearly_africa_share_eui():
@@ -111,17 +111,6 @@ def yearly_africa_share_eui_multi():
     return df
 
 
-def g7_eui_imputed_multi_africa():
-    # Get G7 contributions to EUI
-    g7_eui = download_g7_eui().filter(["year", "value"])
-    eui_africa = yearly_africa_share_eui().filter(["year", "share"])
-
-    # Merge the two dataframes
-    df = g7_eui.merge(eui_africa, on="year", how="outer")
-    df["value"] = df["value"] * df["share"]
-    return df.filter(["year", "value"])
-
-
 def yearly_g7_share_of_eui():
 
     # Get all core contributions to EUI
@@ -155,72 +144,16 @@ def calculate_non_g7_value(eui_data: pd.DataFrame) -> pd.DataFrame:
     )
 
 
-def g7_eui_africa_bilateral():
-
-    g7 = download_g7_africa_bilateral()
-    eui = download_eui_africa_bilateral()
-
-    return (
-        pd.concat([g7, eui], ignore_index=True)
-        .groupby(["year", "recipient_name"], as_index=False)[["value"]]
-        .sum()
-    )
-
-
-def g7_eui_all_bilateral():
-
-    g7 = download_g7_all_bilateral()
-    eui = download_eui_all_bilateral()
-
-    return (
-        pd.concat([g7, eui], ignore_index=True)
-        .groupby(["year", "recipient_name"], as_index=False)[["value"]]
-        .sum()
-    )
-
-
 def g7_eui_africa_share() -> pd.DataFrame:
-    africa_bilateral = g7_eui_africa_bilateral()
-    all_bilateral = g7_eui_all_bilateral()
-
-    bilateral = pd.concat([africa_bilateral, all_bilateral], ignore_index=True)
-
-    africa_imputed = download_g7_africa_multi()
-    all_imputed = download_g7_all_multi()
-
-    eu_africa_imputed = download_eui_africa_multi()
-
-    eui_portion_africa_imputed = g7_eui_imputed_multi_africa().assign(
-        recipient_name="Africa", value=lambda d: d.value * -1
-    )
-    eui_portion_all_imputed = (
-        download_g7_eui()
-        .filter(["year", "value"])
-        .assign(recipient_name="Developing countries", value=lambda d: d.value * -1)
-    )
-
-    imputed_to_subtract = pd.concat(
-        [eui_portion_africa_imputed, eui_portion_all_imputed], ignore_index=True
-    )
-
-    imputed = pd.concat(
-        [africa_imputed, all_imputed, imputed_to_subtract, eu_africa_imputed],
-        ignore_index=True,
-    ).filter(["year", "recipient_name", "value"])
-
-    df = (
-        pd.concat([bilateral, imputed], ignore_index=True)
-        .groupby(["year", "recipient_name"], as_index=False)["value"]
-        .sum()
-    )
-
-    df = df.pivot(
-        index=["year"], columns="recipient_name", values="value"
-    ).reset_index()
-
-    df["share"] = round(100 * df["Africa"] / df["Developing countries"], 2)
-
-    return df
+    """Share of the G7 and EU Institutions' net ODA going to Africa."""
+    return recipient_shares(
+        [AFRICA],
+        donors="G7",
+        start_year=START,
+        dac2a_plan=DAC2A_PLAN,
+        dac1_plan=DAC1_PLAN,
+        clip=False,
+    ).rename(columns={"Africa share": "share"})
 
 
 def eu_inst_africa_share() -> pd.DataFrame:
@@ -243,14 +176,22 @@ def eu_inst_africa_share() -> pd.DataFrame:
     return df
 
 
-if __name__ == "__main__":
-    # data = g7_eui_africa_share()
-    # data.to_csv(Paths.aid_to_africa_output / "g7_eui_africa_share.csv", index=False)
+def export_g7_eui_africa_share() -> None:
+    data = g7_eui_africa_share()
+    data.to_csv(Paths.aid_to_africa_output / "g7_eui_africa_share.csv", index=False)
+
+
+def export_eu_africa_share() -> None:
+    eu_data = eu_inst_africa_share()
+    eu_data.to_csv(Paths.aid_to_africa_output / "eu_africa_share.csv", index=False)
 
+
+if __name__ == "__main__":
     from pydeflate import set_pydeflate_path, exchange
 
     set_pydeflate_path(Paths.raw_data)
     eu_data = eu_inst_africa_share()
+    log_run_cache_stats("eu_inst_africa_share")
 
     eu_data2 = exchange(
         eu_data.assign(id_col="EU Institutions"),
@@ -275,5 +216,3 @@ if __name__ == "__main__":
         date_column="year",
         id_type="DAC",
     )
-
-    # eu_data.to_csv(Paths.aid_to_africa_output / "eu_africa_share.csv", index=False)
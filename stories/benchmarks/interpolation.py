@@ -0,0 +1,47 @@
+import time
+
+import pandas as pd
+
+from stories.benchmarks.synthetic import END_YEAR, START_YEAR, synthetic_gni_targets
+from stories.config import logger
+from stories.eu27_targets.oda_projections import _interpolate_gni_projections
+
+
+def _time(func, *args, repeat: int = 3, **kwargs) -> tuple[float, pd.DataFrame]:
+    """Return the best wall time over `repeat` runs, and the result."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings), result
+
+
+def benchmark_interpolation(sizes: tuple[int, ...] = (30, 300, 3_000)) -> pd.DataFrame:
+    """Compare the per-donor loop and the vectorized interpolation."""
+    results = []
+
+    for donors in sizes:
+        df = synthetic_gni_targets(donors)
+
+        loop, expected = _time(
+            _interpolate_gni_projections, df, START_YEAR, END_YEAR, vectorized=False
+        )
+        vectorized, result = _time(
+            _interpolate_gni_projections, df, START_YEAR, END_YEAR, vectorized=True
+        )
+
+        pd.testing.assert_frame_equal(result, expected)
+
+        logger.info(
+            f"{donors} donors: loop {loop:.3f}s, vectorized {vectorized:.3f}s "
+            f"({loop / vectorized:.0f}x)"
+        )
+        results.append({"donors": donors, "loop": loop, "vectorized": vectorized})
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    benchmark_interpolation()
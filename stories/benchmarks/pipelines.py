@@ -0,0 +1,188 @@
+import subprocess
+from datetime import datetime
+
+import pandas as pd
+
+from stories.benchmarks.interpolation import _time
+from stories.benchmarks.synthetic import (
+    END_YEAR,
+    START_YEAR,
+    synthetic_crs,
+    synthetic_deflators,
+    synthetic_gni_targets,
+)
+from stories.config import Paths, logger
+from stories.eu27_targets.growth import extend_deflators_to_year
+from stories.eu27_targets.oda_projections import _interpolate_gni_projections
+from stories.health_oda.common import compact_crs, filter_health_sectors
+from stories.health_oda.covid import covid_flags
+from stories.health_oda.get_oda import CRS_FILE, CRS_INDICATORS, GROUPER, _scan_crs
+from stories.health_oda.multi_vs_bi import (
+    _health_split,
+    _top_x_providers,
+    top_providers_grid,
+)
+from stories.health_oda.trends import group_by_grouper
+
+RESULTS_DIR = Paths.output / "benchmarks"
+
+# A result is flagged as a regression if it is this much slower than the baseline
+REGRESSION_THRESHOLD: float = 1.2
+
+
+def _commit() -> str:
+    """Short hash of the current commit, to label the results."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Paths.project,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def benchmark_health(
+    rows: tuple[int, ...] = (1_000_000, 5_000_000), repeat: int = 3
+) -> list[dict]:
+    """Time the health ODA steps on synthetic CRS frames of each size."""
+    results = []
+
+    for size in rows:
+        crs = synthetic_crs(size)
+
+        steps = {
+            "filter_health_sectors": lambda: filter_health_sectors(crs),
+            "group_by_grouper": lambda: group_by_grouper(crs, grouper=GROUPER),
+            "covid_flags": lambda: covid_flags(crs),
+        }
+        health = filter_health_sectors(crs)
+        steps |= {
+            "health_split": lambda: _health_split(health.copy()),
+            "top_x_providers": lambda: _top_x_providers(
+                health.copy(), donor_type="Multilateral donors"
+            ),
+            "top_providers_grid": lambda: top_providers_grid(
+                health.copy(), top_xs=[3, 5, 10], rolling_years=[1, 2, 3]
+            ),
+        }
+
+        for name, step in steps.items():
+            seconds, _ = _time(step, repeat=repeat)
+            logger.info(f"{name} ({size:,} rows): {seconds:.3f}s")
+            results.append({"benchmark": name, "size": size, "seconds": seconds})
+
+    return results
+
+
+def benchmark_projections(
+    donors: tuple[int, ...] = (30, 300, 3_000), repeat: int = 3
+) -> list[dict]:
+    """Time the projection steps on synthetic data for each number of donors."""
+    results = []
+
+    for size in donors:
+        targets = synthetic_gni_targets(size)
+        deflators = synthetic_deflators(size)
+
+        steps = {
+            "_interpolate_gni_projections": lambda: _interpolate_gni_projections(
+                targets, START_YEAR, END_YEAR
+            ),
+            "extend_deflators_to_year": lambda: extend_deflators_to_year(
+                deflators, END_YEAR, rolling_window=3
+            ),
+        }
+
+        for name, step in steps.items():
+            seconds, _ = _time(step, repeat=repeat)
+            logger.info(f"{name} ({size:,} donors): {seconds:.3f}s")
+            results.append({"benchmark": name, "size": size, "seconds": seconds})
+
+    return results
+
+
+def crs_memory(start_year: int = 1990, end_year: int = 2023) -> dict:
+    """Memory (MB) of a real all-sector CRS pull, as read and with compact types.
+
+    Needs the bulk CRS file, which is only available after it has been
+    downloaded by oda_data."""
+    if not CRS_FILE.exists():
+        raise FileNotFoundError(f"The bulk CRS file is missing: {CRS_FILE}")
+
+    crs = _scan_crs(CRS_INDICATORS[0], start_year, end_year, health_only=False)
+
+    result = {
+        "years": f"{start_year}-{end_year}",
+        "rows": len(crs),
+        "read_mb": crs.memory_usage(deep=True).sum() / 1e6,
+        "compact_mb": crs.pipe(compact_crs).memory_usage(deep=True).sum() / 1e6,
+    }
+    logger.info(
+        f"CRS {result['years']} ({result['rows']:,} rows): "
+        f"{result['read_mb']:.0f} MB as read, {result['compact_mb']:.0f} MB compact"
+    )
+
+    return result
+
+
+def save_results(results: pd.DataFrame) -> None:
+    """Save the results, labelled with the time and commit, under output/benchmarks."""
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    results.to_csv(
+        RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}_{_commit()}.csv", index=False
+    )
+
+
+def load_baseline() -> pd.DataFrame | None:
+    """The most recent saved results, if any."""
+    files = sorted(RESULTS_DIR.glob("*.csv")) if RESULTS_DIR.exists() else []
+    return pd.read_csv(files[-1]) if files else None
+
+
+def compare_to_baseline(results: pd.DataFrame, baseline: pd.DataFrame) -> pd.DataFrame:
+    """Ratio of each timing to the baseline. Regressions are logged as warnings."""
+    comparison = results.merge(
+        baseline.filter(["benchmark", "size", "seconds"]),
+        on=["benchmark", "size"],
+        how="left",
+        suffixes=("", "_baseline"),
+    ).assign(ratio=lambda d: d.seconds / d.seconds_baseline)
+
+    for row in comparison.loc[lambda d: d.ratio > REGRESSION_THRESHOLD].itertuples():
+        logger.warning(
+            f"{row.benchmark} ({row.size:,}) is {row.ratio:.1f}x slower than the "
+            f"baseline ({row.seconds:.3f}s vs {row.seconds_baseline:.3f}s)"
+        )
+
+    return comparison
+
+
+def benchmark_pipelines(
+    rows: tuple[int, ...] = (1_000_000, 5_000_000),
+    donors: tuple[int, ...] = (30, 300, 3_000),
+    repeat: int = 3,
+    save: bool = True,
+) -> pd.DataFrame:
+    """Time the health ODA and projection steps, compare them to the last saved
+    results and save the new ones."""
+    results = pd.DataFrame(
+        benchmark_health(rows, repeat=repeat)
+        + benchmark_projections(donors, repeat=repeat)
+    ).assign(commit=_commit())
+
+    baseline = load_baseline()
+
+    if baseline is not None:
+        results = compare_to_baseline(results, baseline)
+
+    if save:
+        save_results(results)
+
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_pipelines()
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+from stories.health_oda.common import (
+    RECIPIENT_GROUPS,
+    compact_crs,
+    get_health_purpose_codes,
+)
+from stories.health_oda.multi_vs_bi import bilat_donors, multi_donors
+
+START_YEAR: int = 2018
+TARGET_YEAR: int = 2030
+END_YEAR: int = 2034
+
+# Keywords text, most CRS rows have none
+KEYWORDS: list[str] = [
+    "COVID-19",
+    "covid-19 vaccines",
+    "malaria",
+    "HIV/AIDS",
+    "maternal health",
+    "nutrition",
+    "climate",
+]
+
+
+def synthetic_crs(
+    rows: int,
+    years: range = range(1990, 2023),
+    health_share: float = 0.15,
+    seed: int = 42,
+) -> pd.DataFrame:
+    """Create a CRS-like frame with the columns returned by the health ODA loaders
+    (GROUPER plus value).
+
+    Purpose codes are health codes (from get_health_purpose_codes) for about
+    `health_share` of the rows. Columns use the compact types of the loaders
+    (see compact_crs), so that frames of 1M-50M rows fit in memory.
+    """
+    rng = np.random.default_rng(seed)
+
+    health_codes = np.array(get_health_purpose_codes(), dtype="int32")
+    other_codes = np.setdiff1d(np.arange(11110, 99821, 10, dtype="int32"), health_codes)
+
+    donors = np.array(list(bilat_donors() | multi_donors()), dtype="int32")
+    recipients = np.array(
+        sorted({c for group in RECIPIENT_GROUPS.values() if group for c in group}),
+        dtype="int32",
+    )
+
+    is_health = rng.random(rows) < health_share
+    purpose_code = np.where(
+        is_health,
+        rng.choice(health_codes, rows),
+        rng.choice(other_codes, rows),
+    )
+
+    # About one in ten rows has keywords
+    keyword_codes = rng.integers(0, len(KEYWORDS), rows)
+    keyword_codes[rng.random(rows) > 0.1] = -1
+
+    return pd.DataFrame(
+        {
+            "year": rng.integers(years.start, years.stop, rows, dtype="int32"),
+            "indicator": pd.Categorical.from_codes(
+                np.zeros(rows, dtype="int8"),
+                categories=["crs_bilateral_flow_disbursement_gross"],
+            ),
+            "donor_code": rng.choice(donors, rows),
+            "recipient_code": rng.choice(recipients, rows),
+            "purpose_code": purpose_code,
+            "keywords": pd.Categorical.from_codes(keyword_codes, categories=KEYWORDS),
+            "prices": pd.Categorical.from_codes(
+                np.zeros(rows, dtype="int8"), categories=["constant"]
+            ),
+            "value": rng.lognormal(0, 2, rows),
+        }
+    ).pipe(compact_crs)
+
+
+def synthetic_gni_targets(donors: int, seed: int = 42) -> pd.DataFrame:
+    """Create ODA/GNI ratios with the gaps left by _get_gni_targets_from_target_year:
+    historical years up to 2023, nothing until the target year, then the target."""
+    rng = np.random.default_rng(seed)
+
+    years = [*range(START_YEAR, 2024), *range(TARGET_YEAR, END_YEAR + 1)]
+
+    df = pd.DataFrame(
+        {
+            "year": np.tile(years, donors),
+            "donor_code": np.repeat(np.arange(1, donors + 1), len(years)),
+            "oda_gni_ratio": rng.uniform(0.001, 0.01, donors * len(years)),
+        }
+    )
+
+    # Some historical values are missing too
+    missing = rng.random(len(df)) < 0.05
+    df.loc[missing & (df.year > START_YEAR), "oda_gni_ratio"] = np.nan
+
+    return df
+
+
+def synthetic_deflators(donors: int, seed: int = 42) -> pd.DataFrame:
+    """Create WEO-like deflators (as get_current_deflators) for `donors` donors,
+    with the last year of data varying between 2026 and 2029."""
+    rng = np.random.default_rng(seed)
+
+    last_years = rng.integers(2026, 2030, donors)
+    frames = [
+        pd.DataFrame(
+            {
+                "dac_code": code,
+                "iso_code": f"D{code:04d}",
+                "year": pd.to_datetime(list(range(1980, last_year + 1)), format="%Y"),
+                "value": np.cumprod(1 + rng.normal(0.02, 0.01, last_year - 1979)),
+            }
+        )
+        for code, last_year in enumerate(last_years, start=1)
+    ]
+
+    return pd.concat(frames, ignore_index=True).astype({"dac_code": "Int32"})
@@ -1,5 +1,6 @@
 from pathlib import Path
 import logging
+import os
 
 logging.basicConfig(level=logging.DEBUG, format="%(levelname)s: %(message)s")
 logger = logging.getLogger("data_stories")
@@ -17,3 +18,10 @@ class Paths:
     health_oda = output / "health_oda"
     eu27_oda_project = scripts / "eu27_targets"
     eu_project_data = eu27_oda_project / "EU ODA" / "docs" / "data"
+
+
+# Opt-in profiling of pipe steps and data loads (see stories/profiling.py)
+if os.environ.get("STORIES_PROFILE"):
+    from stories.profiling import enable_profiling
+
+    enable_profiling()
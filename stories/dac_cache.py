@@ -0,0 +1,283 @@
+import hashlib
+import json
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+import oda_reader
+
+from oda_reader.schemas.dac1_translation import convert_dac1_to_dotstat_codes
+from oda_reader.schemas.dac2_translation import convert_dac2a_to_dotstat_codes
+from oda_reader.schemas.schema_tools import preprocess, read_schema_translation
+
+from stories.config import Paths, logger
+
+CACHE_DIR: Path = Paths.raw_data / "dac_cache"
+UPDATES_FILE: Path = Paths.raw_data / "data_updates.json"
+
+# Filter names and the matching SDMX columns in the raw API response
+DIMENSIONS: dict[str, str] = {
+    "donor": "DONOR",
+    "recipient": "RECIPIENT",
+    "measure": "MEASURE",
+    "flow_type": "FLOW_TYPE",
+    "unit_measure": "UNIT_MEASURE",
+    "price_base": "PRICE_BASE",
+}
+
+# Frames already materialised during this run, and the time it took to load them
+_RUN_CACHE: dict[str, pd.DataFrame] = {}
+_LOAD_SECONDS: dict[str, float] = {}
+_RUN_STATS: dict[str, float] = {"hits": 0, "misses": 0, "seconds_saved": 0.0}
+
+
+def dac_release() -> str:
+    """Return the OECD DAC release date recorded in raw_data/data_updates.json."""
+    with open(UPDATES_FILE, "r") as f:
+        return json.load(f)["OECD DAC"]
+
+
+def _normalise_filters(filters: dict | None) -> dict:
+    """Sort multi-valued filters so that equivalent requests share a key."""
+    if not filters:
+        return {}
+
+    return {
+        k: sorted(v) if isinstance(v, (list, tuple, set)) else v
+        for k, v in sorted(filters.items())
+    }
+
+
+def cache_key(dataflow: str, filters: dict | None, start_year: int | None, **options):
+    """Create a content hash for a DAC request."""
+    payload = json.dumps(
+        {
+            "dataflow": dataflow,
+            "filters": _normalise_filters(filters),
+            "start_year": start_year,
+            **options,
+        },
+        sort_keys=True,
+        default=str,
+    )
+
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _release_dir() -> Path:
+    """Folder for the current release. Folders for older releases are removed."""
+    release = dac_release()
+    folder = CACHE_DIR / release
+
+    if CACHE_DIR.exists():
+        for old in CACHE_DIR.iterdir():
+            if old.is_dir() and old.name != release:
+                logger.info(f"Removing DAC cache for release {old.name}")
+                shutil.rmtree(old)
+
+    folder.mkdir(parents=True, exist_ok=True)
+
+    return folder
+
+
+def _load(dataflow: str, key: str, **kwargs) -> pd.DataFrame:
+    """Load a DAC slice from the parquet cache or download it from the API."""
+    path = _release_dir() / f"{dataflow}_{key}.parquet"
+
+    if path.exists():
+        logger.debug(f"Loading {dataflow} {kwargs['filters']} from cache")
+        return pd.read_parquet(path)
+
+    downloader = {
+        "dac1": oda_reader.download_dac1,
+        "dac2a": oda_reader.download_dac2a,
+    }[dataflow]
+
+    df = downloader(**kwargs)
+
+    df.to_parquet(path, index=False)
+
+    return df
+
+
+def _cached_download(
+    dataflow: str,
+    start_year: int | None = None,
+    filters: dict | None = None,
+    pre_process: bool = True,
+    dotstat_codes: bool = True,
+    copy: bool = True,
+) -> pd.DataFrame:
+    """Return a DAC slice, reusing frames already loaded during this run.
+
+    Callers receive a copy, so changes to the returned frame do not affect the
+    data served to other callers. Internal callers that only read from the
+    frame can pass `copy=False`.
+    """
+    key = cache_key(
+        dataflow,
+        filters,
+        start_year,
+        pre_process=pre_process,
+        dotstat_codes=dotstat_codes,
+    )
+
+    if key in _RUN_CACHE:
+        _RUN_STATS["hits"] += 1
+        _RUN_STATS["seconds_saved"] += _LOAD_SECONDS[key]
+        logger.debug(f"Run cache hit for {dataflow} {filters}")
+        return _RUN_CACHE[key].copy() if copy else _RUN_CACHE[key]
+
+    start = time.perf_counter()
+    df = _load(
+        dataflow,
+        key,
+        start_year=start_year,
+        filters=filters,
+        pre_process=pre_process,
+        dotstat_codes=dotstat_codes,
+    )
+
+    _RUN_STATS["misses"] += 1
+    _LOAD_SECONDS[key] = time.perf_counter() - start
+    _RUN_CACHE[key] = df
+
+    return df.copy() if copy else df
+
+
+def clear_run_cache() -> None:
+    """Forget the frames loaded during this run and reset the counters."""
+    _RUN_CACHE.clear()
+    _LOAD_SECONDS.clear()
+    reset_run_cache_stats()
+
+
+def reset_run_cache_stats() -> None:
+    """Reset the run cache counters, keeping the frames loaded so far."""
+    _RUN_STATS.update({"hits": 0, "misses": 0, "seconds_saved": 0.0})
+
+
+def run_cache_stats() -> dict:
+    """Return the hit/miss counters and the load time saved by the run cache."""
+    return dict(_RUN_STATS)
+
+
+def log_run_cache_stats(story: str = "DAC") -> None:
+    """Log the hit/miss counters for the run cache."""
+    stats = run_cache_stats()
+    logger.info(
+        f"{story} run cache: {stats['hits']} hits, {stats['misses']} misses, "
+        f"{stats['seconds_saved']:.1f}s of loading saved"
+    )
+
+
+def download_dac1(
+    start_year: int | None = None,
+    filters: dict | None = None,
+    pre_process: bool = True,
+    dotstat_codes: bool = True,
+) -> pd.DataFrame:
+    """Cached version of oda_reader.download_dac1."""
+    return _cached_download(
+        "dac1",
+        start_year=start_year,
+        filters=filters,
+        pre_process=pre_process,
+        dotstat_codes=dotstat_codes,
+    )
+
+
+def download_dac2a(
+    start_year: int | None = None,
+    filters: dict | None = None,
+    pre_process: bool = True,
+    dotstat_codes: bool = True,
+) -> pd.DataFrame:
+    """Cached version of oda_reader.download_dac2a."""
+    return _cached_download(
+        "dac2a",
+        start_year=start_year,
+        filters=filters,
+        pre_process=pre_process,
+        dotstat_codes=dotstat_codes,
+    )
+
+
+def _as_list(value: str | list[str]) -> list[str]:
+    return (
+        [str(v) for v in value]
+        if isinstance(value, (list, tuple, set))
+        else [str(value)]
+    )
+
+
+def widen_filters(plan: list[dict]) -> dict:
+    """Combine several filter dicts into one query with multi-valued dimensions.
+
+    A dimension is left out of the combined query (i.e. all values are
+    requested) if any of the filters in the plan does not restrict it.
+    """
+    widened = {}
+
+    for dimension in set().union(*plan):
+        values = [filters.get(dimension) for filters in plan]
+
+        if any(v is None for v in values):
+            continue
+
+        widened[dimension] = sorted({code for v in values for code in _as_list(v)})
+
+    return widened
+
+
+def _slice_raw(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    """Keep the rows of a raw (not pre-processed) response matching `filters`."""
+    mask = pd.Series(True, index=df.index)
+
+    for dimension, value in filters.items():
+        mask &= df[DIMENSIONS[dimension]].astype("string").isin(_as_list(value))
+
+    return df.loc[mask]
+
+
+def _planned_download(
+    dataflow: str, filters: dict, plan: list[dict], start_year: int | None = None
+) -> pd.DataFrame:
+    """Return the slice for `filters` from one widened query covering the plan."""
+    widened = widen_filters([*plan, filters])
+
+    raw = _cached_download(
+        dataflow,
+        start_year=start_year,
+        filters=widened,
+        pre_process=False,
+        dotstat_codes=False,
+        copy=False,
+    )
+
+    convert = {
+        "dac1": convert_dac1_to_dotstat_codes,
+        "dac2a": convert_dac2a_to_dotstat_codes,
+    }[dataflow]
+
+    df = preprocess(
+        df=_slice_raw(raw, filters),
+        schema_translation=read_schema_translation(version=dataflow),
+    )
+
+    return convert(df).reset_index(drop=True)
+
+
+def planned_download_dac1(
+    filters: dict, plan: list[dict], start_year: int | None = None
+) -> pd.DataFrame:
+    """Get a DAC1 slice from a single query shared by all the filters in `plan`."""
+    return _planned_download("dac1", filters, plan=plan, start_year=start_year)
+
+
+def planned_download_dac2a(
+    filters: dict, plan: list[dict], start_year: int | None = None
+) -> pd.DataFrame:
+    """Get a DAC2A slice from a single query shared by all the filters in `plan`."""
+    return _planned_download("dac2a", filters, plan=plan, start_year=start_year)
@@ -0,0 +1,253 @@
+import hashlib
+import json
+from functools import lru_cache
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pydeflate import deflate, set_pydeflate_path
+from pydeflate.utils import oecd_codes
+
+from stories.config import Paths, logger
+from stories.dac_cache import dac_release
+from stories.fingerprints import raw_files
+from stories.weo import weo_indicator, weo_vintage
+
+set_pydeflate_path(Paths.raw_data)
+
+STORE_DIR: Path = Paths.raw_data / "deflator_factors"
+
+# Currencies (pydeflate codes) and base years included in the store
+CURRENCIES: list[str] = ["USA", "EUI", "GBR", "CAN"]
+BASE_YEARS: list[int] = list(range(2000, 2031))
+
+# Price data used by pydeflate for the OECD DAC deflators and exchange rates
+DAC1_FILE: Path = Paths.raw_data / "pydeflate_dac1.feather"
+
+
+def _store_paths() -> tuple[Path, Path]:
+    """Paths to the factors array and its index, for the current DAC release,
+    pydeflate price data and WEO vintage."""
+    sources = json.dumps([dac_release(), raw_files([DAC1_FILE.name]), weo_vintage()])
+    version = hashlib.sha256(sources.encode()).hexdigest()[:12]
+
+    return STORE_DIR / f"factors_{version}.npy", STORE_DIR / f"index_{version}.json"
+
+
+def _dac_factors(
+    grid: pd.DataFrame, base_year: int, source_currency: str, target_currency: str
+) -> np.ndarray:
+    """Use pydeflate to get the multiplier for every (donor_code, year) in grid."""
+    return deflate(
+        df=grid.assign(factor=1.0),
+        base_year=base_year,
+        deflator_source="oecd_dac",
+        deflator_method="dac_deflator",
+        exchange_source="oecd_dac",
+        exchange_method="implied",
+        source_currency=source_currency,
+        target_currency=target_currency,
+        id_column="donor_code",
+        id_type="DAC",
+        date_column="year",
+        source_column="factor",
+        target_column="factor",
+    )["factor"].to_numpy()
+
+
+def _weo_deflators(grid: pd.DataFrame, base_year: int) -> np.ndarray:
+    """WEO GDP deflators rebased to base_year, for every (donor_code, year) in grid.
+    NaN for donors without WEO data (like the DAC total or the EU Institutions)."""
+    from stories.eu27_targets.growth import add_dac_codes, rebase_value
+
+    deflators = (
+        weo_indicator("NGDP_D")
+        .pipe(add_dac_codes)
+        .dropna(subset=["dac_code"])
+        .pipe(rebase_value, year=base_year)
+        .assign(year=lambda d: d.year.dt.year)
+        .filter(["dac_code", "year", "value"])
+    )
+
+    return grid.merge(
+        deflators,
+        left_on=["donor_code", "year"],
+        right_on=["dac_code", "year"],
+        how="left",
+    )["value"].to_numpy()
+
+
+def build_factor_store(
+    base_years: list[int] | None = None, currencies: list[str] | None = None
+) -> None:
+    """Precompute the price conversion multipliers and save them under raw_data.
+
+    The store holds one multiplier per (base year, source currency, target
+    currency, donor, year). Donors are stored once per pydeflate id (e.g. all
+    the EU Institutions codes share the EUI deflator).
+
+    Base years after the last year of DAC data use the DAC deflators for that
+    last year, rebased with the WEO GDP deflators (as in `to_constant`). Donors
+    without WEO deflators are recorded, so that converting them raises an error.
+    """
+    base_years = BASE_YEARS if base_years is None else base_years
+    currencies = CURRENCIES if currencies is None else currencies
+
+    dac1 = pd.read_feather(DAC1_FILE)
+    years = np.arange(dac1.year.dt.year.min(), dac1.year.dt.year.max() + 1)
+    last_dac_year = int(years[-1])
+
+    # One DAC donor code per pydeflate id
+    codes = oecd_codes()
+    ids = sorted(set(dac1.iso_code) & set(codes.values()))
+    id_codes = {iso: min(k for k, v in codes.items() if v == iso) for iso in ids}
+
+    grid = pd.DataFrame(
+        {
+            "donor_code": np.repeat([id_codes[iso] for iso in ids], len(years)),
+            "year": np.tile(years, len(ids)),
+        }
+    )
+
+    # WEO deflators for the base years after the last DAC year, and the ids
+    # without them (their factors are NaN for those base years)
+    weo = {
+        year: _weo_deflators(grid, year) for year in base_years if year > last_dac_year
+    }
+    weo_missing = {
+        year: [
+            iso for iso, row in zip(ids, w.reshape(len(ids), -1)) if np.isnan(row).all()
+        ]
+        for year, w in weo.items()
+    }
+
+    combos = list(product(base_years, currencies, currencies))
+    factors = np.full((len(combos), len(ids), len(years)), np.nan)
+
+    for i, (base_year, source, target) in enumerate(combos):
+        logger.debug(f"Building deflator factors for {base_year} {source}-{target}")
+        dac = _dac_factors(grid, min(base_year, last_dac_year), source, target)
+
+        if base_year > last_dac_year:
+            dac = dac / weo[base_year]
+
+        factors[i] = dac.reshape(len(ids), len(years))
+
+    factors_path, index_path = _store_paths()
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+
+    np.save(factors_path, factors)
+
+    with open(index_path, "w") as f:
+        json.dump(
+            {
+                "combos": combos,
+                "ids": ids,
+                "codes": {k: v for k, v in codes.items() if v in ids},
+                "first_year": int(years[0]),
+                "last_year": last_dac_year,
+                "weo_missing": weo_missing,
+            },
+            f,
+        )
+
+    load_factor_store.cache_clear()
+
+
+@lru_cache
+def load_factor_store() -> tuple[np.ndarray, dict, np.ndarray]:
+    """Load the memory-mapped factors, the combos index and a dense array mapping
+    every DAC donor code to its row. The store is built if it doesn't exist."""
+    factors_path, index_path = _store_paths()
+
+    if not factors_path.exists():
+        logger.info("Deflator factor store not found, building it...")
+        build_factor_store()
+
+    factors = np.load(factors_path, mmap_mode="r")
+
+    with open(index_path, "r") as f:
+        index = json.load(f)
+
+    index["combos"] = {tuple(c): i for i, c in enumerate(index["combos"])}
+
+    # Donors without their own deflator use the DAC total, as in pydeflate
+    codes = {int(k): index["ids"].index(v) for k, v in index["codes"].items()}
+    rows = np.full(max(codes) + 1, index["ids"].index("DAC"), dtype=np.int16)
+    rows[list(codes)] = list(codes.values())
+
+    return factors, index, rows
+
+
+def conversion_factors(
+    donor_codes,
+    years,
+    base_year: int,
+    source_currency: str,
+    target_currency: str,
+) -> np.ndarray:
+    """Multipliers to convert current prices in source_currency to constant
+    base_year prices in target_currency, for each donor code and year."""
+    factors, index, rows = load_factor_store()
+
+    try:
+        combo = index["combos"][(base_year, source_currency, target_currency)]
+    except KeyError:
+        raise ValueError(
+            f"{base_year} {source_currency}-{target_currency} is not in the deflator "
+            f"factor store, which covers base years {BASE_YEARS[0]}-{BASE_YEARS[-1]} "
+            f"and the currencies {', '.join(CURRENCIES)}."
+        )
+
+    # Missing codes are set to -1, so they are treated like unknown codes
+    codes = pd.Series(donor_codes).astype("Int64").fillna(-1).to_numpy("int64")
+    known = (codes >= 0) & (codes < len(rows))
+
+    # Missing codes and codes outside the lookup array fall back to the DAC total
+    donor_rows = np.full(len(codes), index["ids"].index("DAC"), dtype=np.int16)
+    donor_rows[known] = rows[codes[known]]
+
+    # Base years after the last DAC year need WEO deflators, which some donors
+    # (and the DAC total used for unknown donors) don't have
+    used = {index["ids"][row] for row in np.unique(donor_rows)}
+    missing = sorted(used & set(index["weo_missing"].get(str(base_year), [])))
+
+    if missing:
+        raise ValueError(
+            f"No WEO deflators to convert to {base_year} prices for "
+            f"{', '.join(missing)}. Use a base year up to {index['last_year']}."
+        )
+
+    year_positions = np.asarray(years, dtype="int64") - index["first_year"]
+    valid = (year_positions >= 0) & (year_positions < factors.shape[2])
+
+    result = np.full(len(codes), np.nan)
+    result[valid] = factors[combo, donor_rows[valid], year_positions[valid]]
+
+    return result
+
+
+def convert_prices(
+    df: pd.DataFrame,
+    base_year: int,
+    source_currency: str,
+    target_currency: str,
+    columns: list[str],
+    id_column: str = "donor_code",
+    date_column: str = "year",
+) -> pd.DataFrame:
+    """Convert `columns` to constant prices using the precomputed factor store."""
+    factors = conversion_factors(
+        df[id_column],
+        df[date_column],
+        base_year=base_year,
+        source_currency=source_currency,
+        target_currency=target_currency,
+    )
+
+    return df.assign(**{column: df[column] * factors for column in columns})
+
+
+if __name__ == "__main__":
+    build_factor_store()
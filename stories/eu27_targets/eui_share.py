@@ -1,9 +1,10 @@
 import pandas as pd
 from oda_data import set_data_path, ODAData
-from oda_reader import download_dac1
-from pydeflate import set_pydeflate_path, deflate
+from pydeflate import set_pydeflate_path
 
 from stories import config
+from stories.dac_cache import download_dac1
+from stories.deflators import convert_prices
 from stories.eu27_targets.common import EU27, EU28
 
 CURRENCY = "USD"
@@ -13,20 +14,12 @@ set_pydeflate_path(config.Paths.raw_data)
 
 
 def to_constant_eur(data: pd.DataFrame, year: int, column: str) -> pd.DataFrame:
-    return deflate(
-        df=data,
+    return convert_prices(
+        data,
         base_year=year,
         source_currency="USA" if CURRENCY == "USD" else "EUI",
         target_currency="EUI",
-        date_column="year",
-        deflator_source="oecd_dac",
-        deflator_method="dac_deflator",
-        exchange_source="oecd_dac",
-        exchange_method="implied",
-        source_column=column,
-        target_column=column,
-        id_column="donor_code",
-        id_type="DAC",
+        columns=[column],
     )
 
 
@@ -1,9 +1,10 @@
 import pandas as pd
-from bblocks import set_bblocks_data_path, WorldEconomicOutlook, convert_id
+from bblocks import set_bblocks_data_path, convert_id
 
 from oda_data import donor_groupings
 
 from stories import config
+from stories.weo import weo_indicator
 
 eu27 = list(donor_groupings()["eu27_countries"].keys())
 
@@ -48,12 +49,8 @@ def calculate_deflator(data: pd.DataFrame) -> pd.DataFrame:
 
 def get_constant_deflators(base: int = 2022):
 
-    weo = WorldEconomicOutlook()
-
-    weo.load_data("NGDP_D")
-
     df = (
-        weo.get_data()
+        weo_indicator("NGDP_D")
         .pipe(add_dac_codes)
         .pipe(filter_eu27)
         .pipe(rebase_value, year=base)
@@ -64,12 +61,8 @@ def get_constant_deflators(base: int = 2022):
 
 def get_current_deflators(base: int = 2023):
 
-    weo = WorldEconomicOutlook()
-
-    weo.load_data("NGDP")
-
     df = (
-        weo.get_data()
+        weo_indicator("NGDP")
         .pipe(add_dac_codes)
         .pipe(filter_eu27)
         .pipe(calculate_growth_rate)
@@ -85,55 +78,53 @@ def extend_deflators_to_year(
 ) -> pd.DataFrame:
     """This function creates rows for each donor for the missing years between the
     max year in the data and the last year specified in the arguments. The value is
-    rolling average of the previous 3 years"""
+    rolling average of the previous 3 years.
 
-    def fill_with_rolling_average(
-        idx, group: pd.DataFrame, rolling_window: int = 3
-    ) -> pd.DataFrame:
+    All donors are extended together, working on a year x donor matrix."""
 
-        # calculate yearly diff
-        group["yearly_diff"] = group["value"].diff()
-
-        new_index = pd.Index(
-            range(group.year.max() - rolling_window, last_year + 1), name="year"
-        )
-
-        new_df = group.set_index("year").reindex(new_index)
-        new_df["yearly_diff"] = (
-            new_df["yearly_diff"].rolling(window=rolling_window).mean()
-        )
-        new_df["yearly_diff"] = new_df["yearly_diff"].ffill()
-        new_df["value"] = new_df.value.fillna(
-            (new_df["value"].shift(1).ffill() + new_df["yearly_diff"].shift(1).cumsum())
-        )
+    data = data.assign(year=lambda d: d.year.dt.year)
 
-        new_df = new_df.drop(columns=["yearly_diff"])
-        group = group.drop(columns=["yearly_diff"])
+    # Number each donor, in the order of the groupby
+    data["group"] = data.groupby(
+        ["dac_code", "iso_code"], dropna=False, observed=True
+    ).ngroup()
 
-        new_df[["dac_code", "iso_code"]] = idx
+    # calculate yearly diff
+    data["yearly_diff"] = data.groupby("group")["value"].diff()
 
-        new_df = new_df.loc[lambda d: d.index > group.year.max()]
+    # Each donor is extended using the years from (max year - rolling window)
+    max_year = data.groupby("group")["year"].max()
+    first_year = max_year - rolling_window
 
-        group = group
-        new_df = new_df.reset_index()
+    years = pd.Index(range(first_year.min(), last_year + 1), name="year")
 
-        group = pd.concat([group, new_df], ignore_index=False)
-        return group
+    values = data.pivot(index="year", columns="group", values="value").reindex(years)
+    diffs = data.pivot(index="year", columns="group", values="yearly_diff").reindex(
+        years
+    )
 
-    data = data.assign(year=lambda d: d.year.dt.year)
+    before_window = years.to_numpy()[:, None] < first_year.to_numpy()[None, :]
+    values = values.mask(before_window)
+    diffs = diffs.mask(before_window)
 
-    dfs = []
+    diffs = diffs.rolling(window=rolling_window).mean().ffill()
+    values = values.fillna(values.shift(1).ffill() + diffs.shift(1).cumsum())
 
-    for group_idx, group_data in data.groupby(
-        ["dac_code", "iso_code"], dropna=False, observed=True
-    ):
-        dfs.append(
-            fill_with_rolling_average(
-                idx=group_idx, group=group_data, rolling_window=rolling_window
-            )
+    new_rows = (
+        values.reset_index()
+        .melt(id_vars="year", var_name="group", value_name="value")
+        .loc[lambda d: d.year > d.group.map(max_year)]
+        .join(
+            data.drop_duplicates("group").set_index("group")[["dac_code", "iso_code"]],
+            on="group",
         )
+    )
 
-    return pd.concat(dfs, ignore_index=True)
+    return (
+        pd.concat([data.drop(columns=["yearly_diff"]), new_rows], ignore_index=True)
+        .sort_values("group", kind="stable", ignore_index=True)
+        .drop(columns=["group"])
+    )
 
 
 if __name__ == "__main__":
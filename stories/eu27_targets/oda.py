@@ -1,4 +1,5 @@
 import json
+from functools import lru_cache
 
 import pandas as pd
 from oda_data import donor_groupings, set_data_path, ODAData
@@ -18,6 +19,14 @@ from stories.eu27_targets.eui_share import download_eu_x_eui
 set_data_path(config.Paths.raw_data)
 set_pydeflate_path(config.Paths.raw_data)
 
+# include_ukraine and include_idrc settings for each spending scenario
+SCENARIOS: dict[str, tuple[bool, bool]] = {
+    "full": (True, True),
+    "no_ukr": (False, True),
+    "no_idrc": (True, False),
+    "no_ukr_no_idrc": (False, False),
+}
+
 
 def export_targets() -> None:
     eu_countries = donor_groupings()["eu27_countries"]
@@ -211,6 +220,78 @@ def format_eu_totals_chart(data: pd.DataFrame) -> pd.DataFrame:
     return data
 
 
+@lru_cache
+def _scenario_components(years: tuple[int, ...]) -> pd.DataFrame:
+    """Load total ODA, GNI, IDRC and Ukraine spending once per set of years."""
+
+    oda = get_total_oda_and_gni(years=list(years))
+
+    refugees = (
+        get_total_refugee_spending(years=list(years))
+        .filter(["year", "donor_code", "idrc_ge_linked"])
+        .fillna(0)
+    )
+
+    ukr = get_total_ukraine_spending(years=list(years)).filter(
+        ["year", "donor_code", "recipient_total_flow_net"]
+    )
+
+    return oda.merge(refugees, on=["year", "donor_code"], how="left").merge(
+        ukr, on=["year", "donor_code"], how="left"
+    )
+
+
+def get_total_oda_scenarios(
+    years: int | list[int], use_2022_ukraine: bool | None = None
+) -> pd.DataFrame:
+    """Total ODA and GNI for every scenario in SCENARIOS.
+
+    The ODA, GNI, IDRC and Ukraine data is loaded once and each scenario is
+    returned as a block of rows identified by the `scenario` column.
+    """
+    years = tuple(years) if isinstance(years, (list, tuple, range)) else (years,)
+
+    components = _scenario_components(years).copy()
+
+    if use_2022_ukraine:
+        # For each donor_code, forward fill with 2022 value
+        components["recipient_total_flow_net"] = components.groupby("donor_code")[
+            "recipient_total_flow_net"
+        ].ffill()
+    else:
+        components = components.fillna({"recipient_total_flow_net": 0})
+
+    scenarios = (
+        pd.DataFrame.from_dict(
+            SCENARIOS, orient="index", columns=["include_ukraine", "include_idrc"]
+        )
+        .rename_axis("scenario")
+        .reset_index()
+    )
+
+    df = scenarios.merge(components, how="cross")
+
+    df["total_oda_official_definition"] = (
+        df["total_oda_official_definition"]
+        - df["idrc_ge_linked"].where(~df["include_idrc"], 0)
+        - df["recipient_total_flow_net"].where(~df["include_ukraine"], 0)
+    )
+
+    return df.drop(
+        columns=[
+            "include_ukraine",
+            "include_idrc",
+            "idrc_ge_linked",
+            "recipient_total_flow_net",
+        ]
+    )
+
+
+def scenario_name(include_ukraine: bool = True, include_idrc: bool = True) -> str:
+    """Return the SCENARIOS key for a combination of settings."""
+    return {v: k for k, v in SCENARIOS.items()}[(include_ukraine, include_idrc)]
+
+
 def get_total_oda_data(
     years: int | list[int],
     include_ukraine: bool = True,
@@ -219,39 +300,15 @@ def get_total_oda_data(
 ) -> pd.DataFrame:
     """"""
 
-    oda = get_total_oda_and_gni(years=years)
+    oda = get_total_oda_scenarios(years=years, use_2022_ukraine=use_2022_ukraine)
 
-    if not include_idrc:
-        refugees = (
-            get_total_refugee_spending(years=years)
-            .filter(["year", "donor_code", "idrc_ge_linked"])
-            .fillna(0)
-        )
-        oda = oda.merge(refugees, on=["year", "donor_code"], how="left")
-        oda["total_oda_official_definition"] = (
-            oda["total_oda_official_definition"] - oda["idrc_ge_linked"]
-        )
-        oda = oda.drop(columns=["idrc_ge_linked"])
-
-    if not include_ukraine:
-        ukr = get_total_ukraine_spending(years=years)
-        oda = oda.merge(ukr, on=["year", "donor_code"], how="left")
-
-        if use_2022_ukraine:
-            # For each donor_code, forward fill with 2022 value
-            oda["recipient_total_flow_net"] = oda.groupby("donor_code")[
-                "recipient_total_flow_net"
-            ].transform(lambda x: x.ffill())
+    scenario = scenario_name(include_ukraine=include_ukraine, include_idrc=include_idrc)
 
-        else:
-            oda = oda.fillna({"recipient_total_flow_net": 0})
-
-        oda["total_oda_official_definition"] = (
-            oda["total_oda_official_definition"] - oda["recipient_total_flow_net"]
-        )
-        oda = oda.drop(columns=["recipient_total_flow_net", "recipient_code"])
-
-    return oda
+    return (
+        oda.loc[lambda d: d.scenario == scenario]
+        .drop(columns=["scenario"])
+        .reset_index(drop=True)
+    )
 
 
 if __name__ == "__main__":
@@ -1,10 +1,12 @@
 import json
 
+import numpy as np
 import pandas as pd
 from bblocks import add_short_names_column, convert_id
-from pydeflate import deflate, set_pydeflate_path
+from pydeflate import set_pydeflate_path
 
 from stories.config import Paths
+from stories.deflators import conversion_factors
 from stories.eu27_targets.growth import (
     get_current_deflators,
     extend_deflators_to_year,
@@ -15,10 +17,19 @@ from stories.eu27_targets.oda import (
     calculate_oda_gni_ratio,
     add_target_oda,
     add_target_column,
-    get_total_oda_data,
+    get_total_oda_scenarios,
+    scenario_name,
+    SCENARIOS,
 )
 
 MAX_DATA_YEAR: int = 2023
+
+SCENARIO_LABELS: dict[str, str] = {
+    "full": "Using latest official data",
+    "no_ukr": "Excluding Ukraine",
+    "no_idrc": "Excluding IDRC",
+    "no_ukr_no_idrc": "Excluding Ukraine and IDRC",
+}
 set_pydeflate_path(Paths.raw_data)
 
 
@@ -63,22 +74,25 @@ def projected_gni_to_spending(
     return gni
 
 
-def _interpolate_gni_projections(
+def _interpolate_gni_projections_loop(
     df: pd.DataFrame,
     start_year: int,
     projections_end_year: int,
 ):
-    # for every donor, linearly interpolate any oda_gni_ratio that is missing
+    # for every donor (and scenario), linearly interpolate any missing oda_gni_ratio
     years = pd.DataFrame({"year": range(start_year, projections_end_year + 1)})
+    keys = [c for c in ["scenario", "donor_code"] if c in df.columns]
 
     interpolated_data = []
 
-    for donor in df.donor_code.unique():
-        donor_data = df.loc[lambda d: d.donor_code == donor].copy()
-        donor_data = donor_data.merge(years, on="year", how="right").fillna(
-            {"donor_code": donor}
+    for idx, group in df.groupby(keys, sort=False):
+        donor_data = group.merge(years, on="year", how="right").assign(
+            **dict(zip(keys, idx))
+        )
+        donor_data = donor_data.sort_values("year")
+        donor_data["oda_gni_ratio"] = donor_data["oda_gni_ratio"].interpolate(
+            method="linear"
         )
-        donor_data = donor_data.sort_values("year").interpolate(method="linear")
 
         donor_data = donor_data.astype({"donor_code": "Int32"})
 
@@ -87,42 +101,93 @@ def _interpolate_gni_projections(
     return pd.concat(interpolated_data, ignore_index=True)
 
 
+def _interpolate_gni_projections(
+    df: pd.DataFrame,
+    start_year: int,
+    projections_end_year: int,
+    vectorized: bool = True,
+):
+    """For every donor (and scenario), linearly interpolate any missing oda_gni_ratio.
+
+    The vectorized mode builds the full donor x year grid once and interpolates all
+    donors together. It returns the same data as the per-donor loop.
+    """
+    if not vectorized:
+        return _interpolate_gni_projections_loop(df, start_year, projections_end_year)
+
+    keys = [c for c in ["scenario", "donor_code"] if c in df.columns]
+
+    # Every donor gets every year, in the order in which donors appear in the data
+    grid = (
+        df[keys]
+        .drop_duplicates()
+        .merge(
+            pd.DataFrame({"year": range(start_year, projections_end_year + 1)}),
+            how="cross",
+        )
+    )
+    data = grid.merge(df, on=keys + ["year"], how="left")
+
+    # Position of each year within its donor, and the values to interpolate
+    groups = data.groupby(keys, sort=False).ngroup()
+    position = data.groupby(groups).cumcount()
+    value = data["oda_gni_ratio"]
+    known = position.where(value.notna())
+
+    previous_value = value.groupby(groups).ffill()
+    next_value = value.groupby(groups).bfill()
+    previous_position = known.groupby(groups).ffill()
+    next_position = known.groupby(groups).bfill()
+
+    # Values after the last known value are held constant, as in Series.interpolate
+    interpolated = previous_value + (next_value - previous_value) * (
+        position - previous_position
+    ) / (next_position - previous_position)
+
+    data["oda_gni_ratio"] = value.fillna(interpolated.fillna(previous_value))
+
+    return data.filter(df.columns).astype({"donor_code": "Int32"})
+
+
 def _get_gni_targets_from_target_year(
     oda_df: pd.DataFrame, target_year: int, projections_end_year: int
 ):
-    # latest data
-    latest = oda_df.loc[oda_df.year == MAX_DATA_YEAR].copy()
-
-    at_target = latest.loc[lambda d: d.oda_gni_ratio >= d.target]
-    below_target = latest.loc[lambda d: d.oda_gni_ratio < d.target]
+    # latest data (donors without an ODA/GNI ratio are not projected)
+    latest = oda_df.loc[
+        lambda d: (d.year == MAX_DATA_YEAR) & d.oda_gni_ratio.notna()
+    ].drop(columns=["year"])
+
+    # Every donor for every year between the target year and the end year
+    projected = (
+        pd.DataFrame({"year": range(target_year, projections_end_year + 1)})
+        .merge(latest, how="cross")
+        .assign(below_target=lambda d: d.oda_gni_ratio < d.target)
+        .sort_values(["year", "below_target"], kind="stable")
+    )
 
-    dfs = []
-    for year in range(target_year, projections_end_year + 1):
-        dfs.append(at_target.assign(year=year))
-        dfs.append(below_target.assign(year=year, oda_gni_ratio=lambda d: d.target))
+    # Donors below their target reach it. The rest keep their latest ratio
+    projected["oda_gni_ratio"] = projected["oda_gni_ratio"].where(
+        ~projected["below_target"], projected["target"]
+    )
 
-    df = pd.concat([oda_df, *dfs], ignore_index=True).filter(
-        ["year", "donor_code", "oda_gni_ratio"]
+    df = pd.concat([oda_df, projected], ignore_index=True).filter(
+        ["year", "scenario", "donor_code", "oda_gni_ratio"]
     )
 
     return df
 
 
-def individual_gni_targets(
+def individual_gni_targets_scenarios(
     start_year: int = 2018,
     target_year: int = 2030,
     projections_end_year: int = 2034,
-    include_idrc: bool = True,
-    include_ukraine: bool = True,
     use_2022_ukraine: bool | None = None,
-):
+) -> pd.DataFrame:
+    """GNI targets for every scenario in SCENARIOS, identified by `scenario`."""
     years = list(range(start_year, MAX_DATA_YEAR + 1))
     # Get spending data
-    oda_df = get_total_oda_data(
-        years=years,
-        include_idrc=include_idrc,
-        include_ukraine=include_ukraine,
-        use_2022_ukraine=use_2022_ukraine,
+    oda_df = get_total_oda_scenarios(
+        years=years, use_2022_ukraine=use_2022_ukraine
     ).loc[lambda d: d.donor_code != 918]
 
     # Add ODA/GNI
@@ -139,19 +204,37 @@ def individual_gni_targets(
     return _interpolate_gni_projections(df, start_year, projections_end_year)
 
 
-def individual_spending(
+def individual_gni_targets(
     start_year: int = 2018,
+    target_year: int = 2030,
+    projections_end_year: int = 2034,
     include_idrc: bool = True,
     include_ukraine: bool = True,
-    use_2022_ukraine: bool = None,
+    use_2022_ukraine: bool | None = None,
+):
+    scenario = scenario_name(include_ukraine=include_ukraine, include_idrc=include_idrc)
+
+    return (
+        individual_gni_targets_scenarios(
+            start_year=start_year,
+            target_year=target_year,
+            projections_end_year=projections_end_year,
+            use_2022_ukraine=use_2022_ukraine,
+        )
+        .loc[lambda d: d.scenario == scenario]
+        .drop(columns=["scenario"])
+        .reset_index(drop=True)
+    )
+
+
+def individual_spending_scenarios(
+    start_year: int = 2018, use_2022_ukraine: bool | None = None
 ) -> pd.DataFrame:
+    """Spending and ODA/GNI for every scenario in SCENARIOS."""
     years = list(range(start_year, MAX_DATA_YEAR + 1))
     # Get spending data
-    oda_df = get_total_oda_data(
-        years=years,
-        include_idrc=include_idrc,
-        include_ukraine=include_ukraine,
-        use_2022_ukraine=use_2022_ukraine,
+    oda_df = get_total_oda_scenarios(
+        years=years, use_2022_ukraine=use_2022_ukraine
     ).loc[lambda d: d.donor_code != 918]
 
     # Add ODA/GNI
@@ -160,52 +243,51 @@ def individual_spending(
     return oda_df
 
 
-def to_constant(df: pd.DataFrame, base_year: int = 2025) -> pd.DataFrame:
-    if base_year > 2023:
-        deflators = get_constant_deflators(base=base_year).assign(
-            year=lambda d: d.year.dt.year
+def individual_spending(
+    start_year: int = 2018,
+    include_idrc: bool = True,
+    include_ukraine: bool = True,
+    use_2022_ukraine: bool = None,
+) -> pd.DataFrame:
+    scenario = scenario_name(include_ukraine=include_ukraine, include_idrc=include_idrc)
+
+    return (
+        individual_spending_scenarios(
+            start_year=start_year, use_2022_ukraine=use_2022_ukraine
         )
-        deflate_year = 2023
-    else:
-        deflate_year = base_year
-
-    df = deflate(
-        df=df,
-        base_year=deflate_year,
-        deflator_source="oecd_dac",
-        deflator_method="dac_deflator",
-        exchange_source="oecd_dac",
-        source_currency="EUI",
-        target_currency="EUI",
-        id_column="donor_code",
-        id_type="DAC",
-        date_column="year",
-        source_column="total_oda_official_definition",
-        target_column="total_oda_official_definition",
-    )
-    df = deflate(
-        df=df,
-        base_year=deflate_year,
-        deflator_source="oecd_dac",
-        deflator_method="dac_deflator",
-        exchange_source="oecd_dac",
+        .loc[lambda d: d.scenario == scenario]
+        .drop(columns=["scenario"])
+        .reset_index(drop=True)
+    )
+
+
+def to_constant(
+    df: pd.DataFrame,
+    base_year: int = 2025,
+    columns: list[str] | None = None,
+) -> pd.DataFrame:
+    """Convert `columns` (by default ODA and GNI) to constant prices.
+
+    The multipliers are read from the precomputed deflator store, so all the
+    columns are converted with a single lookup. For base years after 2023, the
+    store rebases the DAC deflators with the WEO deflators, and rows without a
+    WEO deflator are dropped.
+    """
+    if columns is None:
+        columns = ["total_oda_official_definition", "gni"]
+
+    factors = conversion_factors(
+        df["donor_code"],
+        df["year"],
+        base_year=base_year,
         source_currency="EUI",
         target_currency="EUI",
-        id_column="donor_code",
-        id_type="DAC",
-        date_column="year",
-        source_column="gni",
-        target_column="gni",
-    )
-
-    if base_year > 2023:
-        df = df.merge(
-            deflators, left_on=["year", "donor_code"], right_on=["year", "dac_code"]
-        ).assign(
-            total_oda_official_definition=lambda d: d.total_oda_official_definition
-            / d.value,
-            gni=lambda d: d.gni / d.value,
-        )
+    )
+
+    df = df.assign(**{column: df[column] * factors for column in columns})
+
+    if base_year > MAX_DATA_YEAR:
+        df = df.loc[~np.isnan(factors)].reset_index(drop=True)
 
     return df.assign(prices="constant", base_year=base_year)
 
@@ -215,27 +297,12 @@ def spending_versions(
     prices: str = "current",
     base_year: int | None = None,
 ) -> pd.DataFrame:
-    full = individual_spending(
-        start_year=start_year,
-    ).assign(indicator="Using latest official data")
-
-    no_ukr = individual_spending(
-        start_year=start_year,
-        include_ukraine=False,
-    ).assign(indicator="Excluding Ukraine")
-
-    no_idrc = individual_spending(
-        start_year=start_year,
-        include_idrc=False,
-    ).assign(indicator="Excluding IDRC")
-
-    no_ukr_no_idrc = individual_spending(
-        start_year=start_year,
-        include_idrc=False,
-        include_ukraine=False,
-    ).assign(indicator="Excluding Ukraine and IDRC")
-
-    df = pd.concat([full, no_ukr, no_idrc, no_ukr_no_idrc], ignore_index=True)
+    df = (
+        individual_spending_scenarios(start_year=start_year)
+        .assign(indicator=lambda d: d.scenario.map(SCENARIO_LABELS))
+        .drop(columns=["scenario"])
+        .reset_index(drop=True)
+    )
 
     if prices == "constant":
         return to_constant(df, base_year=base_year)
@@ -252,37 +319,16 @@ def target_versions(
     use_2022_ukraine: bool = False,
     to_flourish: bool = True,
 ):
-    full = individual_gni_targets(
-        start_year=start_year,
-        target_year=target_year,
-        projections_end_year=projections_end_year,
-    ).assign(indicator="Using latest official data")
-
-    no_ukr = individual_gni_targets(
-        start_year=start_year,
-        target_year=target_year,
-        projections_end_year=projections_end_year,
-        include_ukraine=False,
-        use_2022_ukraine=use_2022_ukraine,
-    ).assign(indicator="Excluding Ukraine")
-
-    no_idrc = individual_gni_targets(
-        start_year=start_year,
-        target_year=target_year,
-        projections_end_year=projections_end_year,
-        include_idrc=False,
-    ).assign(indicator="Excluding IDRC")
-
-    no_ukr_no_idrc = individual_gni_targets(
-        start_year=start_year,
-        target_year=target_year,
-        projections_end_year=projections_end_year,
-        use_2022_ukraine=use_2022_ukraine,
-        include_idrc=False,
-        include_ukraine=False,
-    ).assign(indicator="Excluding Ukraine and IDRC")
-
-    df = pd.concat([full, no_ukr, no_idrc, no_ukr_no_idrc], ignore_index=True)
+    df = (
+        individual_gni_targets_scenarios(
+            start_year=start_year,
+            target_year=target_year,
+            projections_end_year=projections_end_year,
+            use_2022_ukraine=use_2022_ukraine,
+        )
+        .assign(indicator=lambda d: d.scenario.map(SCENARIO_LABELS))
+        .drop(columns=["scenario"])
+    )
 
     df = add_short_names_column(df=df, id_column="donor_code", id_type="DACCode").drop(
         columns=["donor_code"]
@@ -312,43 +358,39 @@ def target_versions(
     return df
 
 
-def eu_spending_projections(
+def eu_spending_projections_scenarios(
     include_historical: bool = True,
-    exclude_ukraine: bool = False,
-    exclude_idrc: bool = False,
 ) -> pd.DataFrame:
-    """"""
+    """Constant price spending projections for every scenario in SCENARIOS. The
+    scenario is stored in the `indicator` column."""
 
-    suffix = "_excl_ukr" if exclude_ukraine else ""
-    suffix += "_excl_idrc" if exclude_idrc else ""
-
-    targets = individual_gni_targets(
+    targets = individual_gni_targets_scenarios(
         start_year=2018,
         target_year=2030,
         projections_end_year=2034,
         use_2022_ukraine=True,
-        include_idrc=not exclude_idrc,
-        include_ukraine=not exclude_ukraine,
-    ).assign(indicator=f"2023{suffix}")
+    )
 
     if include_historical:
-        historical_constant = individual_spending(
-            start_year=2018,
-            include_idrc=not exclude_idrc,
-            include_ukraine=not exclude_ukraine,
-            use_2022_ukraine=None if exclude_ukraine else True,
+        # Historical spending excluding Ukraine does not carry 2022 values forward
+        historical_constant = individual_spending_scenarios(
+            start_year=2018, use_2022_ukraine=None
         ).pipe(to_constant, base_year=2025)
 
     else:
         historical_constant = pd.DataFrame()
         targets = targets.loc[lambda d: d.year >= 2024]
 
-    constant_projections = get_gni_projections(
-        last_year=2034,
-        prices="constant",
-        base_year=2025,
-        rolling_window=3,
-    ).assign(prices="constant", base_year=2025)
+    constant_projections = (
+        get_gni_projections(
+            last_year=2034,
+            prices="constant",
+            base_year=2025,
+            rolling_window=3,
+        )
+        .assign(prices="constant", base_year=2025)
+        .merge(pd.DataFrame({"scenario": list(SCENARIOS)}), how="cross")
+    )
 
     constant_spending = pd.concat(
         [historical_constant, constant_projections], ignore_index=True
@@ -356,11 +398,13 @@ def eu_spending_projections(
 
     constant_data = targets.merge(
         constant_spending,
-        on=["year", "donor_code"],
+        on=["year", "donor_code", "scenario"],
         how="left",
         suffixes=("", "_h"),
     )
-    constant_data = constant_data.assign(oda=lambda d: d.oda_gni_ratio * d.gni)
+    constant_data = constant_data.assign(
+        oda=lambda d: d.oda_gni_ratio * d.gni, indicator=lambda d: d.scenario
+    )
 
     return constant_data.filter(
         [
@@ -376,6 +420,28 @@ def eu_spending_projections(
     )
 
 
+def eu_spending_projections(
+    include_historical: bool = True,
+    exclude_ukraine: bool = False,
+    exclude_idrc: bool = False,
+) -> pd.DataFrame:
+    """"""
+
+    suffix = "_excl_ukr" if exclude_ukraine else ""
+    suffix += "_excl_idrc" if exclude_idrc else ""
+
+    scenario = scenario_name(
+        include_ukraine=not exclude_ukraine, include_idrc=not exclude_idrc
+    )
+
+    return (
+        eu_spending_projections_scenarios(include_historical=include_historical)
+        .loc[lambda d: d.indicator == scenario]
+        .assign(indicator=f"2023{suffix}")
+        .reset_index(drop=True)
+    )
+
+
 def spending_targets_by_country(
     start_year: int = 2018,
     target_year: int = 2030,
@@ -533,21 +599,11 @@ def scenarios_eu_totals() -> None:
 
     key_numbers = {}
 
-    full = eu_spending_projections(include_historical=True).assign(indicator="full")
-
-    no_idrc = eu_spending_projections(
-        include_historical=True, exclude_idrc=True
-    ).assign(indicator="no_idrc")
-
-    no_ukr = eu_spending_projections(
-        include_historical=True, exclude_ukraine=True
-    ).assign(indicator="no_ukr")
+    order = ["full", "no_idrc", "no_ukr", "no_ukr_no_idrc"]
 
-    no_ukr_no_idrc = eu_spending_projections(
-        include_historical=True, exclude_ukraine=True, exclude_idrc=True
-    ).assign(indicator="no_ukr_no_idrc")
-
-    full_data = pd.concat([full, no_idrc, no_ukr, no_ukr_no_idrc], ignore_index=True)
+    full_data = eu_spending_projections_scenarios(include_historical=True).sort_values(
+        "indicator", key=lambda s: s.map(order.index), kind="stable", ignore_index=True
+    )
     latest = full_data.loc[full_data.year == 2023].filter(
         ["donor_code", "indicator", "oda"]
     )
@@ -582,38 +638,29 @@ def scenarios_eu_totals() -> None:
         Paths.eu_project_data / "additional_spending_yearly.csv", index=False
     )
 
-    full_current = calculate_spending_period(full, "full_latest", start=2023, end=2023)
-    no_idrc_current = calculate_spending_period(
-        no_idrc, "no_idrc_latest", start=2023, end=2023
-    )
-    no_ukr_current = calculate_spending_period(
-        no_ukr, "no_ukr_latest", start=2023, end=2023
-    )
-    no_ukr_no_idrc_current = calculate_spending_period(
-        no_ukr_no_idrc, "no_ukr_no_idrc_latest", start=2023, end=2023
-    )
+    scenarios = {name: full_data.loc[lambda d: d.indicator == name] for name in order}
 
-    full_total = calculate_spending_period(full, "full")
-    no_idrc_total = calculate_spending_period(no_idrc, "no_idrc")
-    no_ukr_total = calculate_spending_period(no_ukr, "no_ukr")
-    no_ukr_no_idrc_total = calculate_spending_period(no_ukr_no_idrc, "no_ukr_no_idrc")
+    for name, data in scenarios.items():
+        key_numbers |= calculate_spending_period(data, name)
 
-    key_numbers |= (
-        full_total
-        | no_idrc_total
-        | no_ukr_total
-        | no_ukr_no_idrc_total
-        | full_current
-        | no_idrc_current
-        | no_ukr_current
-        | no_ukr_no_idrc_current
-    )
+    for name, data in scenarios.items():
+        key_numbers |= calculate_spending_period(
+            data, f"{name}_latest", start=2023, end=2023
+        )
 
     # Save as json
     with open(Paths.eu_project_data / "scenario_totals.json", "w") as f:
         json.dump(key_numbers, f)
 
 
+def export_spending_targets_by_country() -> None:
+    spending_targets_by_country()
+
+
+def export_scenario_totals() -> None:
+    scenarios_eu_totals()
+
+
 if __name__ == "__main__":
     scenarios_eu_totals()
     # spending = spending_targets_by_country()
@@ -1,58 +1,61 @@
 import pandas as pd
 from oda_data import donor_groupings
-from oda_reader import download_dac2a, download_dac1
 
 from stories.config import Paths
+from stories.dac_cache import (
+    planned_download_dac1,
+    planned_download_dac2a,
+    log_run_cache_stats,
+)
+from stories.recipient_shares import recipient_shares
 
 START: int = 2018
-
-eu27 = list(donor_groupings()["eu27_countries"].keys())
-
-
-def download_eui_ukr_bilateral():
-
-    filters = {
-        "donor": "4EU001",
-        "recipient": "UKR",
-        "measure": "206",
+UKRAINE: str = "UKR"
+
+# Every DAC2A/DAC1 slice used in this story, fetched with one query per dataflow.
+# Some slices need all donors, so the donor dimension is not restricted.
+DAC2A_PLAN: list[dict] = [
+    {
+        "recipient": ["UKR", "DPGC"],
+        "measure": ["106", "206"],
         "price_base": "V",
         "unit_measure": "USD",
     }
-    return download_dac2a(start_year=START, filters=filters)
-
-
-def download_eui_ukr_multi():
-
-    filters = {
-        "donor": "4EU001",
-        "recipient": "UKR",
-        "measure": "106",
+]
+DAC1_PLAN: list[dict] = [
+    {
+        "flow_type": "1120",
+        "measure": "2102",
         "price_base": "V",
         "unit_measure": "USD",
     }
-    return download_dac2a(start_year=START, filters=filters)
+]
+
+eu27 = list(donor_groupings()["eu27_countries"].keys())
 
 
-def download_ukr_bilateral():
+def download_eui_ukr_bilateral():
 
     filters = {
+        "donor": "4EU001",
         "recipient": "UKR",
         "measure": "206",
         "price_base": "V",
         "unit_measure": "USD",
     }
-    return download_dac2a(start_year=START, filters=filters).pipe(filter_eu27)
+    return planned_download_dac2a(filters, plan=DAC2A_PLAN, start_year=START)
 
 
-def download_ukr_multi():
+def download_eui_ukr_multi():
 
     filters = {
+        "donor": "4EU001",
         "recipient": "UKR",
         "measure": "106",
         "price_base": "V",
         "unit_measure": "USD",
     }
-    return download_dac2a(start_year=START, filters=filters).pipe(filter_eu27)
+    return planned_download_dac2a(filters, plan=DAC2A_PLAN, start_year=START)
 
 
 def download_eui_all_bilateral():
@@ -64,7 +67,7 @@ def download_eui_all_bilateral():
         "price_base": "V",
         "unit_measure": "USD",
     }
-    return download_dac2a(start_year=START, filters=filters)
+    return planned_download_dac2a(filters, plan=DAC2A_PLAN, start_year=START)
 
 
 def download_eui_all_multi():
@@ -76,29 +79,7 @@ def download_eui_all_multi():
         "price_base": "V",
         "unit_measure": "USD",
     }
-    return download_dac2a(start_year=START, filters=filters)
-
-
-def download_all_bilateral():
-
-    filters = {
-        "recipient": "DPGC",
-        "measure": "206",
-        "price_base": "V",
-        "unit_measure": "USD",
-    }
-    return download_dac2a(start_year=START, filters=filters).pipe(filter_eu27)
-
-
-def download_all_multi():
-
-    filters = {
-        "recipient": "DPGC",
-        "measure": "106",
-        "price_base": "V",
-        "unit_measure": "USD",
-    }
-    return download_dac2a(start_year=START, filters=filters).pipe(filter_eu27)
+    return planned_download_dac2a(filters, plan=DAC2A_PLAN, start_year=START)
 
 
 def download_to_eui():
@@ -108,7 +89,9 @@ def download_to_eui():
         "price_base": "V",
         "unit_measure": "USD",
     }
-    return download_dac1(start_year=START, filters=filters).pipe(filter_eu27)
+    return planned_download_dac1(filters, plan=DAC1_PLAN, start_year=START).pipe(
+        filter_eu27
+    )
 
 
 def download_all_official_eui():
@@ -119,7 +102,7 @@ def download_all_official_eui():
         "unit_measure": "USD",
         "price_base": "V",
     }
-    return download_dac1(start_year=START, filters=filters)
+    return planned_download_dac1(filters, plan=DAC1_PLAN, start_year=START)
 
 
 def yearly_ukr_share_eui():
@@ -154,17 +137,6 @@ def yearly_ukr_share_eui_multi():
     return df
 
 
-def eui_imputed_multi_ukr():
-    # Get EU contributions to EUI
-    eu_eui = download_to_eui().groupby(["year"], as_index=False)["value"].sum()
-    eui_ukr = yearly_ukr_share_eui().filter(["year", "share"])
-
-    # Merge the two dataframes
-    df = eu_eui.merge(eui_ukr, on="year", how="outer")
-    df["value"] = df["value"] * df["share"]
-    return df.filter(["year", "value"])
-
-
 def yearly_share_of_eui():
 
     # Get all core contributions to EUI
@@ -198,99 +170,15 @@ def calculate_non_eu_value(eui_data: pd.DataFrame) -> pd.DataFrame:
     )
 
 
-def eu_eui_ukr_bilateral():
-
-    eu = download_eui_ukr_bilateral()
-    eui = download_eui_ukr_bilateral()
-
-    return (
-        pd.concat([eu, eui], ignore_index=True)
-        .groupby(["year", "recipient_name"], as_index=False)[["value"]]
-        .sum()
-    )
-
-
-def eu_eui_all_bilateral():
-
-    eu = download_all_bilateral()
-    eui = download_eui_all_bilateral()
-
-    return (
-        pd.concat([eu, eui], ignore_index=True)
-        .groupby(["year", "recipient_name"], as_index=False)[["value"]]
-        .sum()
-    )
-
-
 def eu_eui_ukr_share() -> pd.DataFrame:
-    # Get bilateral spending from all of EU + EUI to Ukraine
-    ukr_bilateral = eu_eui_ukr_bilateral()
-
-    # Get bilateral spending from all of EU + EUI to all developing countries
-    all_bilateral = eu_eui_all_bilateral()
-
-    # Total bilateral spending
-    bilateral = pd.concat([ukr_bilateral, all_bilateral], ignore_index=True)
-
-    # ----- Imputations   ------
-
-    # Get imputed to Ukraine from EU countries
-    ukr_imputed = (
-        download_ukr_multi()
-        .groupby(["year", "recipient_name"], dropna=False, observed=True)[["value"]]
-        .sum()
-        .reset_index()
-    )
-    # Get imputed to all developing countries from EU countries
-    all_imputed = (
-        download_all_multi()
-        .groupby(["year", "recipient_name"])[["value"]]
-        .sum()
-        .reset_index()
-    )
-
-    # Get imputed from EU institutions to Ukraine
-    eu_ukr_imputed = download_eui_ukr_multi()
-
-    eui_portion_ukr_imputed = eui_imputed_multi_ukr().assign(
-        recipient_name="Ukraine", value=lambda d: d.value * -1
-    )
-    eui_portion_all_imputed = (
-        download_to_eui()
-        .groupby(["year"], as_index=False)["value"]
-        .sum()
-        .reset_index()
-        .assign(recipient_name="Developing countries", value=lambda d: d.value * -1)
-    )
-
-    imputed_to_subtract = pd.concat(
-        [eui_portion_ukr_imputed, eui_portion_all_imputed], ignore_index=True
-    )
-
-    imputed = (
-        pd.concat(
-            [ukr_imputed, all_imputed, imputed_to_subtract, eu_ukr_imputed],
-            ignore_index=True,
-        )
-        .groupby(["year", "recipient_name"])[["value"]]
-        .sum()
-        .reset_index()
-        .assign(value=lambda d: d.value.clip(lower=0))
-    )
-
-    df = (
-        pd.concat([bilateral, imputed], ignore_index=True)
-        .groupby(["year", "recipient_name"], as_index=False)["value"]
-        .sum()
-    )
-
-    df = df.pivot(
-        index=["year"], columns="recipient_name", values="value"
-    ).reset_index()
-
-    df["share"] = round(100 * df["Ukraine"] / df["Developing countries"], 2)
-
-    return df
+    """Share of the EU27 and EU Institutions' net ODA going to Ukraine."""
+    return recipient_shares(
+        [UKRAINE],
+        donor_codes=eu27,
+        start_year=START,
+        dac2a_plan=DAC2A_PLAN,
+        dac1_plan=DAC1_PLAN,
+    ).rename(columns={"Ukraine share": "share"})
 
 
 def filter_eu27(data: pd.DataFrame) -> pd.DataFrame:
@@ -317,17 +205,11 @@ def eu_inst_ukr_share() -> pd.DataFrame:
     return df
 
 
-if __name__ == "__main__":
-    ...
-    data = eu_eui_ukr_share()
-    # data.to_csv(Paths.aid_to_africa_output / "g7_eui_africa_share.csv", index=False)
+def export_eu_ukr() -> None:
+    from pydeflate import exchange
 
-    from pydeflate import set_pydeflate_path, exchange
+    data = eu_eui_ukr_share()
 
-    #
-    # set_pydeflate_path(Paths.raw_data)
-    # eu_data = eu_inst_africa_share()
-    #
     eu_data = exchange(
         data.assign(id_col="EU Institutions"),
         source_currency="USA",
@@ -341,17 +223,8 @@ if __name__ == "__main__":
     )
 
     eu_data.to_csv(Paths.eu_project_data / "eu_ukr.csv", index=False)
-    #
-    # eu_data2 = exchange(
-    #     eu_data2.assign(id_col="EU Institutions"),
-    #     source_currency="USA",
-    #     target_currency="FRA",
-    #     rates_source="oecd_dac",
-    #     id_column="id_col",
-    #     value_column="Developing countries",
-    #     target_column="Developing countries",
-    #     date_column="year",
-    #     id_type="DAC",
-    # )
-
-    # eu_data.to_csv(Paths.aid_to_africa_output / "eu_africa_share.csv", index=False)
+
+
+if __name__ == "__main__":
+    export_eu_ukr()
+    log_run_cache_stats("eu_eui_ukr_share")
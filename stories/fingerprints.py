@@ -0,0 +1,128 @@
+import hashlib
+import importlib
+import inspect
+import json
+import re
+from importlib import metadata
+from pathlib import Path
+
+from stories.config import Paths
+
+MANIFEST: Path = Paths.output / "fingerprints.json"
+
+# Packages that compute the data (imputations, deflators, code mappings), so an
+# upgrade can change the outputs
+DATA_PACKAGES: list[str] = ["oda_data", "pydeflate", "oda_reader", "bblocks"]
+
+# `from stories.x import ...` and `import stories.x` statements
+_IMPORT = re.compile(r"^\s*(?:from|import)\s+(stories(?:\.\w+)*)", re.MULTILINE)
+
+
+def _module_file(module_name: str) -> Path | None:
+    """Path to the source of a `stories` module, if it exists."""
+    path = Paths.project / Path(*module_name.split("."))
+
+    for candidate in (path.with_suffix(".py"), path / "__init__.py"):
+        if candidate.exists():
+            return candidate
+
+    return None
+
+
+def story_sources(module_name: str) -> dict[str, str]:
+    """Hash the source of a module and of every `stories` module it imports,
+    directly or indirectly (including imports inside functions)."""
+    hashes = {}
+    pending = [module_name]
+
+    while pending:
+        name = pending.pop()
+        path = _module_file(name)
+
+        if name in hashes or path is None:
+            continue
+
+        source = path.read_text()
+        hashes[name] = hashlib.sha256(source.encode()).hexdigest()
+        pending.extend(_IMPORT.findall(source))
+
+    return dict(sorted(hashes.items()))
+
+
+def raw_files(patterns: list[str]) -> list[tuple[str, int, int]]:
+    """Name, size and modification time of the raw files matching `patterns`."""
+    files = {
+        path
+        for pattern in patterns
+        for path in Paths.raw_data.glob(pattern)
+        if path.is_file()
+    }
+
+    return sorted(
+        (
+            str(path.relative_to(Paths.raw_data)),
+            path.stat().st_size,
+            path.stat().st_mtime_ns,
+        )
+        for path in files
+    )
+
+
+def package_versions() -> dict[str, str | None]:
+    """Installed version of each of the DATA_PACKAGES (None if not installed)."""
+    versions = {}
+
+    for package in DATA_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+
+    return versions
+
+
+def output_fingerprint(output: str, patterns: list[str]) -> str:
+    """Fingerprint an output ('module:function') from its code, its parameters,
+    the raw files it reads and the versions of the DATA_PACKAGES."""
+    module_name, function = output.split(":")
+    func = getattr(importlib.import_module(module_name), function)
+
+    payload = json.dumps(
+        {
+            "output": output,
+            "parameters": str(inspect.signature(func)),
+            "sources": story_sources(module_name),
+            "raw_files": raw_files(patterns),
+            "packages": package_versions(),
+        },
+        sort_keys=True,
+    )
+
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def load_manifest() -> dict[str, str]:
+    """Fingerprint recorded for each output file (relative to the project)."""
+    if not MANIFEST.exists():
+        return {}
+
+    with open(MANIFEST, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(fingerprints: dict[str, str]) -> None:
+    """Record the fingerprints of freshly built output files."""
+    manifest = load_manifest() | fingerprints
+
+    MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(MANIFEST, "w") as f:
+        json.dump(dict(sorted(manifest.items())), f, indent=2)
+
+
+def is_up_to_date(files: list[str], fingerprint: str, manifest: dict) -> bool:
+    """True if all the files exist and were built with this fingerprint."""
+    return bool(files) and all(
+        (Paths.project / file).exists() and manifest.get(file) == fingerprint
+        for file in files
+    )
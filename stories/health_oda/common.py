@@ -1,8 +1,15 @@
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 from oda_data import recipient_groupings
 from oda_data.clean_data.schema import OdaSchema
 
 from stories import config
+from stories.fingerprints import raw_files
 
 RECIPIENT_GROUPS = {
     "Developing Countries, Total": None,
@@ -14,18 +21,144 @@ RECIPIENT_GROUPS = {
 
 CURRENCIES: dict = {"USD": "USA", "EUR": "EUI", "GBP": "GBR", "CAD": "CAN"}
 
+MEMBERSHIP_DIR: Path = config.Paths.raw_data / "recipient_membership"
+
+# World Bank income levels. Recipients are stored with their position in this
+# list (-1 if they don't have one).
+INCOME_LEVELS: list[str] = [
+    "Low income",
+    "Lower middle income",
+    "Upper middle income",
+    "High income",
+]
+
+# Bit of each recipient group in the membership bitmask. Groups without a list
+# of members include every recipient.
+GROUP_BITS: dict[str, int] = {
+    name: 1 << i
+    for i, name in enumerate(n for n, g in RECIPIENT_GROUPS.items() if g is not None)
+}
 
-def add_income_grouping(df: pd.DataFrame) -> pd.DataFrame:
-    """Add the income groupings to the dataframe."""
+# Compact types for CRS frames: small integer codes, and categoricals for the
+# repeated text columns (keywords are dictionary-encoded)
+CRS_TYPES: dict[str, str] = {
+    "year": "int16",
+    "donor_code": "Int16",
+    "recipient_code": "Int16",
+    "purpose_code": "Int32",
+    "indicator": "category",
+    "prices": "category",
+    "keywords": "category",
+}
+
+
+def _membership_path() -> Path:
+    """Path to the membership table for the current income classification."""
+    files = json.dumps(raw_files(["income_levels.csv"]))
+    version = hashlib.sha256(files.encode()).hexdigest()[:12]
+
+    return MEMBERSHIP_DIR / f"membership_{version}.parquet"
+
+
+def _build_membership() -> pd.DataFrame:
+    """Income level (from bblocks) and group bitmask of every DAC recipient."""
     from bblocks import add_income_level_column, set_bblocks_data_path
 
     set_bblocks_data_path(config.Paths.raw_data)
 
+    codes = set(recipient_groupings()["all_recipients"])
+    codes |= {c for group in RECIPIENT_GROUPS.values() if group for c in group}
+
     df = add_income_level_column(
-        df, id_column=OdaSchema.RECIPIENT_CODE, id_type="DACCode"
+        pd.DataFrame({OdaSchema.RECIPIENT_CODE: sorted(codes)}),
+        id_column=OdaSchema.RECIPIENT_CODE,
+        id_type="DACCode",
+    )
+
+    groups = np.zeros(len(df), dtype="uint8")
+    for name, bit in GROUP_BITS.items():
+        groups[df[OdaSchema.RECIPIENT_CODE].isin(list(RECIPIENT_GROUPS[name]))] |= bit
+
+    return pd.DataFrame(
+        {
+            OdaSchema.RECIPIENT_CODE: df[OdaSchema.RECIPIENT_CODE].astype("int16"),
+            "income_level": pd.Categorical(
+                df.income_level, categories=INCOME_LEVELS
+            ).codes,
+            "groups": groups,
+        }
     )
 
-    return df
+
+@lru_cache
+def recipient_membership() -> tuple[np.ndarray, np.ndarray]:
+    """Income level positions and group bitmasks, as dense arrays indexed by
+    recipient code. The table is built once per income classification vintage
+    and saved under raw_data."""
+    path = _membership_path()
+
+    if not path.exists():
+        table = _build_membership()
+
+        # Building the table may have downloaded the classification
+        path = _membership_path()
+        MEMBERSHIP_DIR.mkdir(parents=True, exist_ok=True)
+        table.to_parquet(path, index=False)
+
+        for old in MEMBERSHIP_DIR.glob("membership_*.parquet"):
+            if old != path:
+                old.unlink()
+
+    table = pd.read_parquet(path)
+    codes = table[OdaSchema.RECIPIENT_CODE].to_numpy()
+
+    income = np.full(codes.max() + 1, -1, dtype="int8")
+    income[codes] = table.income_level.to_numpy()
+
+    groups = np.zeros(codes.max() + 1, dtype="uint8")
+    groups[codes] = table.groups.to_numpy()
+
+    return income, groups
+
+
+def _lookup(array: np.ndarray, recipient_codes, missing) -> np.ndarray:
+    """Values of a membership array for each code (missing for unknown codes)."""
+    codes = pd.Series(recipient_codes).astype("Int64").fillna(-1).to_numpy("int64")
+    known = (codes >= 0) & (codes < len(array))
+
+    result = np.full(len(codes), missing, dtype=array.dtype)
+    result[known] = array[codes[known]]
+
+    return result
+
+
+def income_levels(recipient_codes) -> pd.Categorical:
+    """World Bank income level of each recipient code."""
+    income, _ = recipient_membership()
+
+    return pd.Categorical.from_codes(
+        _lookup(income, recipient_codes, -1), categories=INCOME_LEVELS
+    )
+
+
+def in_recipient_group(recipient_codes, group: str) -> np.ndarray:
+    """True for the recipient codes in a RECIPIENT_GROUPS group."""
+    if RECIPIENT_GROUPS[group] is None:
+        return np.ones(len(recipient_codes), dtype=bool)
+
+    _, groups = recipient_membership()
+
+    return (_lookup(groups, recipient_codes, 0) & GROUP_BITS[group]) > 0
+
+
+def add_income_grouping(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the income groupings to the dataframe."""
+    return df.assign(income_level=income_levels(df[OdaSchema.RECIPIENT_CODE]))
+
+
+def compact_crs(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert the CRS id and text columns to their compact types (CRS_TYPES)."""
+    return df.astype({c: t for c, t in CRS_TYPES.items() if c in df.columns})
 
 
 def get_health_purpose_codes() -> list[str]:
@@ -60,5 +193,5 @@ def filter_low_income_countries(df: pd.DataFrame) -> pd.DataFrame:
 def filter_african_countries(df: pd.DataFrame) -> pd.DataFrame:
     """Filter the dataframe to include only African countries."""
     return df.loc[
-        lambda d: d[OdaSchema.RECIPIENT_CODE].isin(list(RECIPIENT_GROUPS["Africa"]))
+        lambda d: in_recipient_group(d[OdaSchema.RECIPIENT_CODE], "Africa")
     ].reset_index(drop=True)
@@ -0,0 +1,60 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Bits of the COVID-19 flag, one for each kind of rule
+KEYWORD: int = 1
+PURPOSE: int = 2
+DONOR: int = 4
+
+# Keywords (case-insensitive substrings), purpose codes and donor codes that
+# identify COVID-19 spending
+KEYWORD_PATTERNS: list[str] = ["covid"]
+PURPOSE_CODES: list[int] = [12264]  # COVID-19 control
+DONOR_CODES: list[int] = [1047]  # COVID-19 Response and Recovery MPTF
+
+
+def match_keywords(keywords: pd.Series, patterns: list[str]) -> np.ndarray:
+    """True for the keywords containing any of the patterns (case-insensitive).
+
+    All the patterns are matched in a single pass, and each distinct keyword
+    value is only matched once."""
+    if not patterns:
+        return np.zeros(len(keywords), dtype=bool)
+
+    matcher = re.compile("|".join(re.escape(p) for p in patterns), re.IGNORECASE)
+
+    codes, uniques = pd.factorize(keywords)
+    matched = np.fromiter(
+        (matcher.search(str(k)) is not None for k in uniques),
+        dtype=bool,
+        count=len(uniques),
+    )
+
+    # Missing keywords (code -1) pick the extra False at the end
+    return np.append(matched, False)[codes]
+
+
+def covid_flags(
+    df: pd.DataFrame,
+    patterns: list[str] = KEYWORD_PATTERNS,
+    purpose_codes: list[int] = PURPOSE_CODES,
+    donor_codes: list[int] = DONOR_CODES,
+) -> pd.Series:
+    """Bitmask of the COVID-19 rules (KEYWORD, PURPOSE, DONOR) matched by each row.
+    Zero means the row is not about COVID-19."""
+    flags = (
+        KEYWORD * match_keywords(df.keywords, patterns)
+        + PURPOSE * df.purpose_code.isin(purpose_codes).to_numpy(dtype=bool)
+        + DONOR * df.donor_code.isin(donor_codes).to_numpy(dtype=bool)
+    )
+
+    return pd.Series(flags, index=df.index, dtype="uint8")
+
+
+def exclude_covid(
+    df: pd.DataFrame, rules: int = KEYWORD | PURPOSE | DONOR
+) -> pd.DataFrame:
+    """Drop the rows flagged by any of the rules (using the `covid` column)."""
+    return df.loc[lambda d: (d.covid & rules) == 0]
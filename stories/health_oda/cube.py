@@ -0,0 +1,167 @@
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from stories.config import Paths, logger
+from stories.fingerprints import raw_files
+from stories.health_oda.common import (
+    get_health_purpose_codes,
+    in_recipient_group,
+    income_levels,
+)
+from stories.health_oda.covid import covid_flags
+from stories.health_oda.get_oda import (
+    SOURCE_FILES as ODA_SOURCE_FILES,
+    get_imputed_multilateral_health_oda,
+    get_total_bilateral_oda,
+    with_prices,
+)
+
+CUBE_DIR: Path = Paths.raw_data / "health_cube"
+
+# Raw files the cube is built from (plus the income classification). A new cube
+# is built when any of them changes.
+SOURCE_FILES: list[str] = [*ODA_SOURCE_FILES, "income_levels.csv"]
+
+BILATERAL = "crs_bilateral_flow_disbursement_gross"
+MULTILATERAL = "imputed_multi_flow_disbursement_gross"
+
+# Indicators in the cube: loader, first year, last year and the number of years
+# loaded at a time (None to load all the years at once)
+INDICATORS: dict[str, tuple] = {
+    BILATERAL: (get_total_bilateral_oda, 1990, 2023, 1),
+    MULTILATERAL: (get_imputed_multilateral_health_oda, 2012, 2023, None),
+}
+
+# Years loaded before the first year of an indicator. Imputed multilateral flows
+# use 3-year rolling windows, so the first two years loaded are dropped.
+LEAD_YEARS: dict[str, int] = {MULTILATERAL: 2}
+
+# Constant prices stored in the cube (besides current prices). Other base years
+# are converted when queried.
+BASE_YEARS: list[int] = [2022]
+
+# Cube grain, and the flags stored for each row (covid is a bitmask of the
+# COVID-19 rules matched, see covid.py)
+GRAIN: list[str] = [
+    "indicator",
+    "year",
+    "donor_code",
+    "recipient_code",
+    "purpose_code",
+    "prices",
+    "base_year",
+]
+FLAGS: list[str] = ["health", "covid", "low_income", "africa"]
+
+
+def _cube_path() -> Path:
+    """Path to the cube for the current version of the source files."""
+    files = json.dumps(raw_files(SOURCE_FILES))
+    version = hashlib.sha256(files.encode()).hexdigest()[:12]
+
+    return CUBE_DIR / f"health_cube_{version}.parquet"
+
+
+def build_cube() -> pd.DataFrame:
+    """Aggregate the health stories' indicators to the cube grain, in current
+    prices and constant BASE_YEARS prices, with the flags precomputed."""
+    frames = []
+
+    for indicator, (loader, start_year, end_year, chunk_years) in INDICATORS.items():
+        logger.info(f"Adding {indicator} ({start_year}-{end_year}) to the cube")
+        frames.append(
+            loader(
+                start_year=start_year - LEAD_YEARS.get(indicator, 0),
+                end_year=end_year,
+                prices="current",
+                chunk_years=chunk_years,
+            )
+            .assign(covid=covid_flags)
+            .astype({"indicator": str, "prices": str})
+        )
+
+    grouper = [c for c in GRAIN if c not in ("prices", "base_year")] + ["covid"]
+    current = (
+        pd.concat(frames, ignore_index=True)
+        .groupby(grouper, dropna=False, observed=True)["value"]
+        .sum()
+        .reset_index()
+    )
+
+    health_codes = get_health_purpose_codes()
+    targets = [("current", None)] + [("constant", year) for year in BASE_YEARS]
+
+    cube = with_prices(current, targets).assign(
+        health=lambda d: d.purpose_code.isin(health_codes).astype(bool),
+        low_income=lambda d: income_levels(d.recipient_code) == "Low income",
+        africa=lambda d: in_recipient_group(d.recipient_code, "Africa"),
+    )
+
+    return cube.filter(GRAIN + FLAGS + ["value"])
+
+
+@lru_cache
+def health_cube() -> pd.DataFrame:
+    """Load the cube, building it (and removing older versions) if needed."""
+    path = _cube_path()
+
+    if not path.exists():
+        logger.info("Health ODA cube not found, building it...")
+        cube = build_cube()
+
+        # Building the cube may have downloaded some of the source files
+        path = _cube_path()
+        CUBE_DIR.mkdir(parents=True, exist_ok=True)
+        cube.to_parquet(path, index=False)
+
+        for old in CUBE_DIR.glob("health_cube_*.parquet"):
+            if old != path:
+                old.unlink()
+
+    return pd.read_parquet(path)
+
+
+def query_cube(
+    indicator: str = BILATERAL,
+    start_year: int = 1990,
+    end_year: int = 2023,
+    prices: str = "constant",
+    base_year: int | None = 2022,
+    health_only: bool = True,
+) -> pd.DataFrame:
+    """Rows of the cube for an indicator, years and prices (health sectors only
+    by default). Constant prices for base years not in the cube are converted
+    from current prices."""
+    _, first_year, last_year, _ = INDICATORS[indicator]
+
+    if start_year < first_year or end_year > last_year:
+        raise ValueError(
+            f"{indicator} is only in the cube for {first_year}-{last_year}. "
+            "Update INDICATORS to include other years."
+        )
+
+    cube = health_cube()
+
+    stored = prices == "current" or base_year in BASE_YEARS
+    mask = (
+        (cube.indicator == indicator)
+        & cube.year.between(start_year, end_year)
+        & (cube.prices == (prices if stored else "current"))
+    )
+
+    if prices == "constant" and stored:
+        mask &= cube.base_year.eq(base_year).fillna(False)
+
+    if health_only:
+        mask &= cube.health
+
+    df = cube.loc[mask].reset_index(drop=True)
+
+    if not stored:
+        df = with_prices(df, [("constant", base_year)])
+
+    return df
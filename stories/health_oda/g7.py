@@ -1,11 +1,7 @@
 import pandas as pd
 
 from stories import config
-from stories.health_oda.get_oda import (
-    get_total_bilateral_oda,
-    get_bilateral_health_oda,
-    get_imputed_multilateral_health_oda,
-)
+from stories.health_oda.cube import BILATERAL, MULTILATERAL, query_cube
 from stories.health_oda.trends import group_by_grouper
 
 
@@ -35,12 +31,21 @@ def g7_health_share_trend(
     grouper = ["year"]
 
     # Get the data for all sectors
-    all_sectors_bilateral = get_total_bilateral_oda(
-        start_year=start_year, end_year=end_year, prices=prices, base_year=base_year
+    all_sectors_bilateral = query_cube(
+        BILATERAL,
+        start_year=start_year,
+        end_year=end_year,
+        prices=prices,
+        base_year=base_year,
+        health_only=False,
     )
 
-    all_sectors_multilateral = get_imputed_multilateral_health_oda(
-        start_year=start_year - 2, end_year=end_year, prices=prices, base_year=base_year
+    all_sectors_multilateral = query_cube(
+        MULTILATERAL,
+        start_year=start_year,
+        end_year=end_year,
+        prices=prices,
+        base_year=base_year,
     ).astype({"value": float})
 
     all_sectors = (
@@ -51,12 +56,23 @@ def g7_health_share_trend(
     )
 
     # Get the data for health
-    health_bilateral = get_bilateral_health_oda(
-        start_year=start_year, end_year=end_year, prices=prices, base_year=base_year
+    health_bilateral = query_cube(
+        BILATERAL,
+        start_year=start_year,
+        end_year=end_year,
+        prices=prices,
+        base_year=base_year,
     )
 
-    health_multilateral = get_imputed_multilateral_health_oda(
-        start_year=start_year, end_year=end_year, prices=prices, base_year=base_year
+    # Health multilateral flows were loaded from start_year, so the rolling
+    # imputation left out the first two years. Kept for consistency with
+    # published figures.
+    health_multilateral = query_cube(
+        MULTILATERAL,
+        start_year=start_year + 2,
+        end_year=end_year,
+        prices=prices,
+        base_year=base_year,
     ).astype({"value": float})
 
     health = (
@@ -76,7 +92,7 @@ def g7_health_share_trend(
     return data
 
 
-if __name__ == "__main__":
+def export_g7_health_share_trend() -> None:
     health_share = g7_health_share_trend(2012, 2022)
     health_share.rename(
         columns={
@@ -85,3 +101,7 @@ if __name__ == "__main__":
             "share": "Health Share",
         }
     ).to_csv(config.Paths.health_oda / "g7_health_share_trend.csv", index=False)
+
+
+if __name__ == "__main__":
+    export_g7_health_share_trend()
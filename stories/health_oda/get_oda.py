@@ -1,14 +1,59 @@
+import hashlib
+import json
+import shutil
+from functools import lru_cache
+from pathlib import Path
 from typing import Optional
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from oda_data import ODAData, set_data_path
+from oda_data.clean_data.common import clean_column_name, clean_raw_df, read_settings
+from oda_data.config import OdaPATHS
+from oda_data.clean_data.schema import CRS_MAPPING
 
 
 from stories import config
-from stories.health_oda.common import filter_health_sectors
+from stories.config import logger
+from stories.deflators import convert_prices
+from stories.fingerprints import raw_files
+from stories.health_oda.common import (
+    compact_crs,
+    filter_health_sectors,
+    get_health_purpose_codes,
+)
 
 set_data_path(config.Paths.raw_data)
 
+# The bulk CRS file downloaded by oda_data
+CRS_FILE: Path = config.Paths.raw_data / "fullCRS.parquet"
+
+# CRS indicators that can be read straight from CRS_FILE. Their filters and value
+# column come from oda_data's indicator definitions (see _crs_definition).
+CRS_INDICATORS: list[str] = ["crs_bilateral_flow_disbursement_gross"]
+
+CACHE_DIR: Path = config.Paths.raw_data / "health_oda_cache"
+
+# Bumped when the cached loads change, so that older caches are discarded
+CACHE_FORMAT: int = 3
+
+# Raw files read by the health ODA loads. Cached loads are discarded when any of
+# them changes.
+SOURCE_FILES: list[str] = [
+    "crs_*_raw.feather",
+    "fullCRS.parquet",
+    "multisystem*.feather",
+    "table1_raw*.feather",
+    "pydeflate_dac1.feather",
+]
+
+# Loads cached during this run: the data and the years it covers, by load key
+_RANGE_CACHE: dict[str, tuple[pd.DataFrame, set[int]]] = {}
+
+
+# Prices to convert a load to: ("current", None) or ("constant", base_year)
+PriceTargets = list[tuple[str, Optional[int]]]
 
 GROUPER = [
     "year",
@@ -21,37 +66,346 @@ GROUPER = [
 ]
 
 
-def _get_health_oda_indicator(
-    indicator: str,
-    start_year: int = 2000,
-    end_year: int = 2023,
-    prices: str = "current",
-    base_year: Optional[int] = None,
+@lru_cache
+def _crs_definition(indicator: str) -> tuple[dict, str]:
+    """Filters and value column of a CRS indicator, as defined by oda_data (so the
+    CRS scan selects the same rows as ODAData)."""
+    definition = read_settings(OdaPATHS.settings / "indicators.json")[indicator]
+
+    if definition.get("source") != "crs" or "value_column" not in definition:
+        raise ValueError(f"{indicator} is not defined by oda_data as a CRS column")
+
+    return definition.get("filters", {}), definition["value_column"]
+
+
+def _clean_names(schema: pa.Schema) -> dict[str, str]:
+    """Map the clean column names (as set by oda_data) to the raw names in the file."""
+    return {
+        CRS_MAPPING.get(clean_column_name(name), clean_column_name(name)): name
+        for name in schema.names
+    }
+
+
+def _as_type(values: list, data_type: pa.DataType) -> list:
+    """Cast filter values to the type of the column they are compared with."""
+    if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+        return [str(v) for v in values]
+    if pa.types.is_floating(data_type):
+        return [float(v) for v in values]
+    return [int(v) for v in values]
+
+
+def _scan_crs(
+    indicator: str, start_year: int, end_year: int, health_only: bool
 ) -> pd.DataFrame:
+    """Read an indicator from the CRS file, keeping only the GROUPER columns and
+    the value. The year, indicator and health purpose code filters are applied
+    during the scan, so the rest of the file is never loaded."""
+    filters, value_column = _crs_definition(indicator)
+
+    schema = pq.read_schema(CRS_FILE)
+    names = _clean_names(schema)
+
+    predicates = {"year": list(range(start_year, end_year + 1))}
+    predicates |= {column: [value] for column, value in filters.items()}
 
-    # Create an ODAData object
-    oda = ODAData(
-        years=range(start_year, end_year + 1), prices=prices, base_year=base_year
+    if health_only:
+        predicates["purpose_code"] = get_health_purpose_codes()
+
+    columns = [c for c in GROUPER if c in names] + [value_column]
+
+    df = pd.read_parquet(
+        CRS_FILE,
+        engine="pyarrow",
+        columns=[names[c] for c in columns],
+        filters=[
+            (names[c], "in", _as_type(values, schema.field(names[c]).type))
+            for c, values in predicates.items()
+        ],
     )
 
-    # Load the indicator
-    oda.load_indicator(indicator)
+    return (
+        df.pipe(clean_raw_df)
+        .rename(columns={value_column: "value"})
+        .assign(indicator=indicator)
+    )
 
-    # Get the data, filtered by health sectors
-    df = oda.get_data().pipe(filter_health_sectors)
 
-    # Group the data
+def _load_years(
+    indicator: str,
+    start_year: int,
+    end_year: int,
+    prices: str,
+    base_year: Optional[int],
+    health_only: bool,
+) -> pd.DataFrame:
+    """Load an indicator for a range of years and group it by GROUPER.
+
+    CRS indicators are read directly from the bulk CRS file when it exists (see
+    `_scan_crs`). Everything else goes through ODAData."""
+
+    if indicator in CRS_INDICATORS and CRS_FILE.exists():
+        df = _scan_crs(indicator, start_year, end_year, health_only)
+
+        # The CRS is in current USD
+        if prices == "constant":
+            df = convert_prices(df, base_year, "USA", "USA", columns=["value"])
+
+        df = df.assign(prices=prices)
+
+    else:
+        # Create an ODAData object
+        oda = ODAData(
+            years=range(start_year, end_year + 1), prices=prices, base_year=base_year
+        )
+
+        # Load the indicator
+        oda.load_indicator(indicator)
+
+        # Get the data, filtered by health sectors if requested
+        df = oda.get_data()
+
+        if health_only:
+            df = df.pipe(filter_health_sectors)
+
+    # Group the data, using compact types
+    df = df.pipe(compact_crs)
     grouper = [c for c in GROUPER if c in df.columns]
     df = df.groupby(grouper, dropna=False, observed=True)["value"].sum().reset_index()
 
     return df
 
 
+def _load_indicator(
+    indicator: str,
+    start_year: int,
+    end_year: int,
+    prices: str,
+    base_year: Optional[int],
+    health_only: bool,
+    chunk_years: Optional[int] = None,
+) -> pd.DataFrame:
+    """Load and group an indicator for a range of years.
+
+    With `chunk_years`, the indicator is loaded and grouped that many years at a
+    time and the partial sums are combined. Only one chunk of raw rows is in
+    memory at once. Only use it for indicators computed year by year (like CRS
+    flows)."""
+    if chunk_years is None:
+        return _load_years(
+            indicator, start_year, end_year, prices, base_year, health_only
+        )
+
+    chunks = []
+
+    for chunk_start in range(start_year, end_year + 1, chunk_years):
+        chunk_end = min(chunk_start + chunk_years - 1, end_year)
+        logger.debug(f"Loading {indicator} for {chunk_start}-{chunk_end}")
+        chunks.append(
+            _load_years(
+                indicator, chunk_start, chunk_end, prices, base_year, health_only
+            )
+        )
+
+    df = pd.concat(chunks, ignore_index=True).pipe(compact_crs)
+    grouper = [c for c in GROUPER if c in df.columns]
+
+    return df.groupby(grouper, dropna=False, observed=True)["value"].sum().reset_index()
+
+
+def _data_version() -> str:
+    """Short hash of the cache format and the size and modification time of the
+    source files."""
+    files = json.dumps([CACHE_FORMAT, raw_files(SOURCE_FILES)])
+    return hashlib.sha256(files.encode()).hexdigest()[:12]
+
+
+def _version_dir(version: str) -> Path:
+    """Folder for a version of the source files. Older folders are removed."""
+    folder = CACHE_DIR / version
+
+    if CACHE_DIR.exists():
+        for old in CACHE_DIR.iterdir():
+            if old.is_dir() and old.name != version:
+                logger.info(f"Removing health ODA cache {old.name}")
+                shutil.rmtree(old)
+
+    folder.mkdir(parents=True, exist_ok=True)
+
+    return folder
+
+
+def _year_runs(years: list[int]) -> list[tuple[int, int]]:
+    """Split sorted years into runs of consecutive years, as (start, end)."""
+    runs = []
+
+    for year in years:
+        if runs and year == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], year)
+        else:
+            runs.append((year, year))
+
+    return runs
+
+
+def _cached_range(folder: Path, key: str) -> tuple[Optional[pd.DataFrame], set[int]]:
+    """The data cached for a load key, from this run or from disk, and its years."""
+    if f"{folder.name}/{key}" in _RANGE_CACHE:
+        return _RANGE_CACHE[f"{folder.name}/{key}"]
+
+    # The years file is written last, so the data is complete if it exists
+    if (folder / f"{key}.json").exists():
+        with open(folder / f"{key}.json", "r") as f:
+            years = set(json.load(f))
+        return pd.read_parquet(folder / f"{key}.parquet"), years
+
+    return None, set()
+
+
+def _load_range(
+    indicator: str,
+    start_year: int,
+    end_year: int,
+    prices: str,
+    base_year: Optional[int],
+    health_only: bool,
+    chunk_years: Optional[int] = None,
+) -> pd.DataFrame:
+    """Load an indicator for a range of years, reusing any years already loaded
+    (during this run or a previous one) for the same indicator and prices.
+
+    Only the missing years of CRS_INDICATORS are loaded. They are added to the
+    cached data, which is kept in memory and saved under raw_data until the source
+    files change. Other indicators are cached for each range requested."""
+    version = _data_version()
+    folder = _version_dir(version)
+    key = f"{indicator}_{prices}_{base_year}_{'health' if health_only else 'all'}"
+
+    # Imputed indicators use rolling windows, so the years returned depend on the
+    # range loaded. They are only reused for the same range.
+    if indicator not in CRS_INDICATORS:
+        key += f"_{start_year}_{end_year}"
+
+    df, years = _cached_range(folder, key)
+    missing = sorted(set(range(start_year, end_year + 1)) - years)
+
+    if missing:
+        logger.debug(f"Loading {indicator} for {missing[0]}-{missing[-1]}")
+        loaded = [
+            _load_indicator(
+                indicator, start, end, prices, base_year, health_only, chunk_years
+            )
+            for start, end in _year_runs(missing)
+        ]
+
+        # Each year is a separate block, in the order of a single load
+        df = (
+            pd.concat([df, *loaded], ignore_index=True)
+            .pipe(compact_crs)
+            .sort_values("year", kind="stable", ignore_index=True)
+        )
+        years |= set(missing)
+
+        # Loading may have downloaded source files, so save under their version
+        version = _data_version()
+        folder = _version_dir(version)
+
+        # Other processes may be reading the cached files
+        df.to_parquet(folder / f"{key}.parquet.tmp", index=False)
+        (folder / f"{key}.parquet.tmp").replace(folder / f"{key}.parquet")
+        with open(folder / f"{key}.json", "w") as f:
+            json.dump(sorted(years), f)
+
+    _RANGE_CACHE[f"{version}/{key}"] = (df, years)
+
+    return df.loc[lambda d: d.year.between(start_year, end_year)].reset_index(drop=True)
+
+
+def with_prices(df: pd.DataFrame, targets: PriceTargets) -> pd.DataFrame:
+    """Convert current USD data to each (prices, base_year) target. The results
+    are stacked, with `prices` and `base_year` columns."""
+    frames = []
+
+    for prices, base_year in targets:
+        converted = (
+            df
+            if prices == "current"
+            else convert_prices(df, base_year, "USA", "USA", columns=["value"])
+        )
+        frames.append(converted.assign(prices=prices, base_year=base_year))
+
+    return (
+        pd.concat(frames, ignore_index=True)
+        .pipe(compact_crs)
+        .astype({"base_year": "Int16"})
+    )
+
+
+def _load(
+    indicator: str,
+    start_year: int,
+    end_year: int,
+    prices: str,
+    base_year: Optional[int],
+    health_only: bool,
+    chunk_years: Optional[int],
+    targets: Optional[PriceTargets],
+) -> pd.DataFrame:
+    """Load an indicator in one set of prices or, if `targets` are given, load it
+    once in current prices and convert it to every target."""
+    if targets is None:
+        return _load_range(
+            indicator,
+            start_year,
+            end_year,
+            prices,
+            base_year,
+            health_only=health_only,
+            chunk_years=chunk_years,
+        )
+
+    current = _load_range(
+        indicator,
+        start_year,
+        end_year,
+        "current",
+        None,
+        health_only=health_only,
+        chunk_years=chunk_years,
+    )
+
+    return with_prices(current, targets)
+
+
+def _get_health_oda_indicator(
+    indicator: str,
+    start_year: int = 2000,
+    end_year: int = 2023,
+    prices: str = "current",
+    base_year: Optional[int] = None,
+    chunk_years: Optional[int] = None,
+    targets: Optional[PriceTargets] = None,
+) -> pd.DataFrame:
+
+    return _load(
+        indicator,
+        start_year,
+        end_year,
+        prices,
+        base_year,
+        health_only=True,
+        chunk_years=chunk_years,
+        targets=targets,
+    )
+
+
 def get_bilateral_health_oda(
     start_year: int = 2000,
     end_year: int = 2023,
     prices: str = "current",
     base_year: Optional[int] = None,
+    chunk_years: Optional[int] = None,
+    targets: Optional[PriceTargets] = None,
 ) -> pd.DataFrame:
 
     return _get_health_oda_indicator(
@@ -60,6 +414,8 @@ def get_bilateral_health_oda(
         end_year=end_year,
         prices=prices,
         base_year=base_year,
+        chunk_years=chunk_years,
+        targets=targets,
     )
 
 
@@ -68,31 +424,32 @@ def get_total_bilateral_oda(
     end_year: int = 2023,
     prices: str = "current",
     base_year: Optional[int] = None,
+    chunk_years: Optional[int] = None,
+    targets: Optional[PriceTargets] = None,
 ) -> pd.DataFrame:
-    """Gross disbursements of bilateral ODA."""
-    # Create an ODAData object
-    oda = ODAData(
-        years=range(start_year, end_year + 1), prices=prices, base_year=base_year
+    """Gross disbursements of bilateral ODA. Pass `chunk_years` to load the data
+    that many years at a time (see `_load_indicator`), and `targets` to get
+    several prices from a single load (see `with_prices`). Years already loaded
+    are reused (see `_load_range`)."""
+    return _load(
+        "crs_bilateral_flow_disbursement_gross",
+        start_year,
+        end_year,
+        prices,
+        base_year,
+        health_only=False,
+        chunk_years=chunk_years,
+        targets=targets,
     )
 
-    # Load the indicator
-    oda.load_indicator("crs_bilateral_flow_disbursement_gross")
-
-    # Get the data, filtered by health sectors
-    df = oda.get_data()
-
-    # Group the data
-    grouper = [c for c in GROUPER if c in df.columns]
-    df = df.groupby(grouper, dropna=False, observed=True)["value"].sum().reset_index()
-
-    return df
-
 
 def get_imputed_multilateral_health_oda(
     start_year: int = 2000,
     end_year: int = 2023,
     prices: str = "current",
     base_year: Optional[int] = None,
+    chunk_years: Optional[int] = None,
+    targets: Optional[PriceTargets] = None,
 ) -> pd.DataFrame:
     return _get_health_oda_indicator(
         indicator="imputed_multi_flow_disbursement_gross",
@@ -100,6 +457,8 @@ def get_imputed_multilateral_health_oda(
         end_year=end_year,
         prices=prices,
         base_year=base_year,
+        chunk_years=chunk_years,
+        targets=targets,
     )
 
 
@@ -1,7 +1,7 @@
 import pandas as pd
 
 from stories import config
-from stories.health_oda.get_oda import get_bilateral_health_oda
+from stories.health_oda.cube import query_cube
 from stories.health_oda.trends import group_by_grouper
 from oda_data import donor_groupings
 
@@ -34,21 +34,12 @@ def map_donor_type(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def health_split(
-    start_year: int = 1990,
-    end_year: int = 2023,
-    prices: str = "constant",
-    base_year: int | None = 2022,
-) -> pd.DataFrame:
+def _health_split(health: pd.DataFrame) -> pd.DataFrame:
+    """Share of health ODA from bilateral and multilateral donors, by year."""
 
     # Define the grouper
     grouper = ["year", "donor_type"]
 
-    # Get the data for health
-    health = get_bilateral_health_oda(
-        start_year=start_year, end_year=end_year, prices=prices, base_year=base_year
-    )
-
     health = health.pipe(map_donor_type).pipe(group_by_grouper, grouper=grouper)
 
     # calculate share by donor type
@@ -63,80 +54,135 @@ def health_split(
     return health
 
 
-def top_x_providers(
+def health_split(
     start_year: int = 1990,
     end_year: int = 2023,
-    donor_type: str = "Bilateral donors",
-    top_x: int = 5,
-    rolling_years: int = 3,
     prices: str = "constant",
     base_year: int | None = 2022,
 ) -> pd.DataFrame:
 
+    # Get the data for health
+    health = query_cube(
+        start_year=start_year, end_year=end_year, prices=prices, base_year=base_year
+    )
+
+    return _health_split(health)
+
+
+def top_providers_grid(
+    health: pd.DataFrame,
+    donor_types: list[str] = ("Bilateral donors", "Multilateral donors"),
+    top_xs: list[int] = (5,),
+    rolling_years: list[int] = (3,),
+) -> dict[tuple[str, int, int], pd.DataFrame]:
+    """Top donors (values and shares) for every combination of donor type, number
+    of donors and rolling window, keyed by (donor_type, top_x, rolling_years).
+
+    The data is grouped once, and each rolling window and ranking is computed
+    once for all the donor types."""
+
     # Define the grouper
     grouper = ["year", "donor_code", "donor_type"]
 
-    # Get the data for health
+    # Group by donor, keeping only donors of the requested types
     health = (
-        get_bilateral_health_oda(
-            start_year=start_year, end_year=end_year, prices=prices, base_year=base_year
-        )
-        .pipe(map_donor_type)
+        health.pipe(map_donor_type)
         .pipe(group_by_grouper, grouper=grouper)
-        .loc[lambda d: d.donor_type == donor_type]
+        .loc[lambda d: d.donor_type.isin(donor_types)]
+        .reset_index(drop=True)
     )
+    health["donor_name"] = health.donor_code.map(multi_donors() | bilat_donors())
 
-    # calculate the rolling average
-    health["value"] = health.groupby("donor_code", dropna=False, observed=True)[
-        "value"
-    ].transform(
-        lambda x: x.rolling(rolling_years, min_periods=rolling_years - 1).mean()
-    )
+    grid = {}
+
+    for window in rolling_years:
+        # rolling average of each donor
+        value = (
+            health.groupby("donor_code", dropna=False, observed=True, sort=False)[
+                "value"
+            ]
+            .rolling(window, min_periods=window - 1)
+            .mean()
+            .reset_index(level=0, drop=True)
+            .sort_index()
+        )
 
-    # add donor share of total
-    health["share"] = health.groupby("year")["value"].transform(
-        lambda x: round(100 * x / x.sum(), 1)
-    )
+        # donor share of the total for its type, and its rank, in each year
+        by_year = health.assign(value=value).groupby(["donor_type", "year"])["value"]
+        ranked = health.assign(
+            value=value,
+            share=(100 * value / by_year.transform("sum")).round(1),
+            rank=by_year.rank(method="first", ascending=False, na_option="bottom"),
+        )
 
-    health["donor_name"] = health.donor_code.map(multi_donors() | bilat_donors())
+        for donor_type in donor_types:
+            of_type = ranked.loc[lambda d: d.donor_type == donor_type]
 
-    # get the top x donors for each year
-    health_top = (
-        health.sort_values(["year", "value"], ascending=[True, False])
-        .groupby("year")
-        .head(top_x)
-        .filter(["year", "donor_name", "value", "share"])
-    )
+            for top_x in top_xs:
+                grid[(donor_type, top_x, window)] = _pivot_top(
+                    of_type.loc[lambda d: d["rank"] <= top_x]
+                )
 
+    return grid
+
+
+def _pivot_top(health_top: pd.DataFrame) -> pd.DataFrame:
+    """Values and shares of the top donors, with a column for each donor."""
     values = (
-        health_top.pivot(
-            index=["year"],
-            columns="donor_name",
-            values="value",
-        )
+        health_top.pivot(index=["year"], columns="donor_name", values="value")
         .reset_index()
         .assign(indicator="value")
     )
 
     shares = (
-        health_top.pivot(
-            index=["year"],
-            columns="donor_name",
-            values="share",
-        )
+        health_top.pivot(index=["year"], columns="donor_name", values="share")
         .reset_index()
         .assign(indicator="share")
     )
 
-    data = pd.concat([values, shares], ignore_index=True)
+    return pd.concat([values, shares], ignore_index=True)
 
-    return data
 
+def _top_x_providers(
+    health: pd.DataFrame,
+    donor_type: str = "Bilateral donors",
+    top_x: int = 5,
+    rolling_years: int = 3,
+) -> pd.DataFrame:
+    """Top donors of a type, by rolling average of health ODA, for each year."""
+    grid = top_providers_grid(
+        health, donor_types=[donor_type], top_xs=[top_x], rolling_years=[rolling_years]
+    )
 
-if __name__ == "__main__":
+    return grid[(donor_type, top_x, rolling_years)]
+
+
+def top_x_providers(
+    start_year: int = 1990,
+    end_year: int = 2023,
+    donor_type: str = "Bilateral donors",
+    top_x: int = 5,
+    rolling_years: int = 3,
+    prices: str = "constant",
+    base_year: int | None = 2022,
+) -> pd.DataFrame:
+
+    # Get the data for health
+    health = query_cube(
+        start_year=start_year, end_year=end_year, prices=prices, base_year=base_year
+    )
+
+    return _top_x_providers(
+        health, donor_type=donor_type, top_x=top_x, rolling_years=rolling_years
+    )
+
+
+def export_bilat_vs_multilat() -> None:
     split = health_split(1990, 2022, prices="current", base_year=None)
     split.to_csv(config.Paths.health_oda / "bilat_vs_multilat.csv", index=False)
 
+
+def export_top5_multi() -> None:
     top5_multi = top_x_providers(
         2008,
         2022,
@@ -148,3 +194,8 @@ if __name__ == "__main__":
     ).loc[lambda d: d.year >= 2010]
 
     top5_multi.to_csv(config.Paths.health_oda / "top5_multi.csv", index=False)
+
+
+if __name__ == "__main__":
+    export_bilat_vs_multilat()
+    export_top5_multi()
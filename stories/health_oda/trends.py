@@ -1,11 +1,8 @@
 import pandas as pd
 
 from stories import config
-from stories.health_oda.common import (
-    filter_low_income_countries,
-    filter_african_countries,
-)
-from stories.health_oda.get_oda import get_bilateral_health_oda, get_total_bilateral_oda
+from stories.health_oda.covid import exclude_covid
+from stories.health_oda.cube import query_cube
 
 
 def low_income_and_africa_trend(
@@ -15,15 +12,15 @@ def low_income_and_africa_trend(
     base_year: int = 2022,
 ):
     # Get bilateral health data
-    full_data = get_bilateral_health_oda(
+    full_data = query_cube(
         start_year=start_year, end_year=end_year, prices=prices, base_year=base_year
     )
 
     # Filter countries
-    low_income = filter_low_income_countries(full_data).assign(
+    low_income = full_data.loc[lambda d: d.low_income].assign(
         recipient_group="Low income"
     )
-    africa = filter_african_countries(full_data).assign(recipient_group="Africa")
+    africa = full_data.loc[lambda d: d.africa].assign(recipient_group="Africa")
 
     df = pd.concat([low_income, africa], ignore_index=True)
 
@@ -54,12 +51,16 @@ def health_share_trend(
     grouper = ["year"]
 
     # Get the data for all sectors
-    all_sectors = get_total_bilateral_oda(
-        start_year=start_year, end_year=end_year, prices=prices, base_year=base_year
+    all_sectors = query_cube(
+        start_year=start_year,
+        end_year=end_year,
+        prices=prices,
+        base_year=base_year,
+        health_only=False,
     ).pipe(group_by_grouper, grouper=grouper)
 
     # Get the data for health
-    health = get_bilateral_health_oda(
+    health = query_cube(
         start_year=start_year, end_year=end_year, prices=prices, base_year=base_year
     ).pipe(group_by_grouper, grouper=grouper)
 
@@ -82,9 +83,7 @@ def pre_post_covid_trend(
 
     # Get the data for health
     health_pre = (
-        get_bilateral_health_oda(
-            start_year=2017, end_year=2019, prices=prices, base_year=base_year
-        )
+        query_cube(start_year=2017, end_year=2019, prices=prices, base_year=base_year)
         .assign(sector="Health", indicator="Pre-COVID")
         .groupby(["year"] + grouper, dropna=False, observed=True)["value"]
         .sum()
@@ -96,9 +95,7 @@ def pre_post_covid_trend(
 
     # Get the data for health
     health_post = (
-        get_bilateral_health_oda(
-            start_year=2020, end_year=2022, prices=prices, base_year=base_year
-        )
+        query_cube(start_year=2020, end_year=2022, prices=prices, base_year=base_year)
         .assign(sector="Health", indicator="Post-COVID")
         .groupby(["year"] + grouper, dropna=False, observed=True)["value"]
         .sum()
@@ -117,20 +114,6 @@ def pre_post_covid_trend(
     return data
 
 
-def remove_covid_keyword(df: pd.DataFrame) -> pd.DataFrame:
-    # exclude any rows where the substring 'covid' appears in the keyword column
-    return df.loc[lambda d: ~d.keywords.str.contains("covid", case=False, na=False)]
-
-
-def remove_covid_purpose(df: pd.DataFrame) -> pd.DataFrame:
-
-    return df.loc[lambda d: d.purpose_code != 12264]
-
-
-def remove_covid_trust_fund(df: pd.DataFrame) -> pd.DataFrame:
-    return df.loc[lambda d: d.donor_code != 1047]
-
-
 def health_with_and_without_covid(
     prices: str = "constant", base_year: int = 2022, start_year: int = 2015
 ) -> pd.DataFrame:
@@ -138,15 +121,12 @@ def health_with_and_without_covid(
     grouper = ["year"]
 
     # Get the data for health
-    health = get_bilateral_health_oda(
+    health = query_cube(
         start_year=start_year, end_year=2022, prices=prices, base_year=base_year
     )
 
-    health_without_covid = (
-        health.pipe(remove_covid_keyword)
-        .pipe(remove_covid_purpose)
-        .pipe(remove_covid_trust_fund)
-    )
+    # COVID-19 keywords, purpose code and trust fund are flagged in the cube
+    health_without_covid = health.pipe(exclude_covid)
 
     health = (
         health.groupby(grouper, observed=True, dropna=False)["value"]
@@ -169,12 +149,14 @@ def health_with_and_without_covid(
     return data
 
 
-if __name__ == "__main__":
+def export_total_health_oda_trend() -> None:
     lic_africa = low_income_and_africa_trend(1990, 2022)
     lic_africa.pivot(
         index=["year", "prices"], columns="recipient_group", values="value"
     ).to_csv(config.Paths.health_oda / "total_health_oda_trend.csv")
 
+
+def export_health_share_trend() -> None:
     health_share = health_share_trend(1990, 2022)
     health_share.rename(
         columns={
@@ -184,10 +166,21 @@ if __name__ == "__main__":
         }
     ).to_csv(config.Paths.health_oda / "health_share_trend.csv", index=False)
 
+
+def export_pre_post_covid_trend() -> None:
     covid = pre_post_covid_trend()
     covid.to_csv(config.Paths.health_oda / "pre_post_covid_trend.csv", index=False)
 
+
+def export_health_with_without_covid() -> None:
     with_without_covid = health_with_and_without_covid()
     with_without_covid.to_csv(
         config.Paths.health_oda / "health_with_without_covid.csv", index=False
     )
+
+
+if __name__ == "__main__":
+    export_total_health_oda_trend()
+    export_health_share_trend()
+    export_pre_post_covid_trend()
+    export_health_with_without_covid()
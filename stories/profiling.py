@@ -0,0 +1,199 @@
+import atexit
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import pandas as pd
+
+from stories.config import Paths, logger
+
+PROFILE_DIR = Paths.output / "profiles"
+
+# Set this environment variable (e.g. STORIES_PROFILE=1) to profile a run
+ENV_VAR = "STORIES_PROFILE"
+
+# Stages recorded during this run, the stages currently running and the
+# original versions of the patched functions
+_RECORDS: list[dict] = []
+_STACK: list[str] = []
+_ORIGINALS: dict[tuple[object, str], object] = {}
+
+
+def _rows(obj) -> int | None:
+    return len(obj) if isinstance(obj, (pd.DataFrame, pd.Series)) else None
+
+
+def _memory(obj) -> int | None:
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    return None
+
+
+def _name(func) -> str:
+    """Readable name for a function (or a pipe (function, keyword) tuple)."""
+    if isinstance(func, tuple):
+        func = func[0]
+    module = getattr(func, "__module__", None) or ""
+    name = getattr(func, "__qualname__", None) or repr(func)
+    return f"{module}.{name}" if module.startswith("stories") else name
+
+
+def run_stage(name: str, func, *args, **kwargs):
+    """Call func, recording the time taken, and the rows and memory of the first
+    argument (if it is a DataFrame or Series) and of the result."""
+    data_in = args[0] if args else None
+    rows_in, memory_in = _rows(data_in), _memory(data_in)
+
+    _STACK.append(name)
+    stack = ";".join(_STACK)
+    start = time.perf_counter()
+
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        _STACK.pop()
+
+    rows_out, memory_out = _rows(result), _memory(result)
+    memory_delta = (
+        memory_out - memory_in if None not in (memory_in, memory_out) else memory_out
+    )
+
+    _RECORDS.append(
+        {
+            "stage": name,
+            "stack": stack,
+            "seconds": seconds,
+            "rows_in": rows_in,
+            "rows_out": rows_out,
+            "memory_in": memory_in,
+            "memory_out": memory_out,
+            "memory_delta": memory_delta,
+        }
+    )
+
+    logger.debug(
+        f"[profile] {name}: {seconds:.3f}s, rows {rows_in} -> {rows_out}, "
+        f"memory {(memory_delta or 0) / 1e6:+.1f} MB"
+    )
+
+    return result
+
+
+def _pipe(self, func, *args, **kwargs):
+    return run_stage(
+        _name(func), _ORIGINALS[(pd.DataFrame, "pipe")], self, func, *args, **kwargs
+    )
+
+
+def _patch(owner, attribute: str, name: str) -> None:
+    """Replace owner.attribute with a version that records a stage."""
+    original = getattr(owner, attribute)
+    _ORIGINALS[(owner, attribute)] = original
+
+    def patched(*args, **kwargs):
+        return run_stage(name, original, *args, **kwargs)
+
+    setattr(owner, attribute, patched)
+
+
+def profiling_enabled() -> bool:
+    return bool(_ORIGINALS)
+
+
+def enable_profiling() -> None:
+    """Record every DataFrame.pipe step and every ODAData and oda_reader load.
+
+    The report is written when the process exits (see `write_report`)."""
+    if profiling_enabled():
+        return
+
+    import oda_reader
+    from oda_data import ODAData
+
+    _ORIGINALS[(pd.DataFrame, "pipe")] = pd.DataFrame.pipe
+    pd.DataFrame.pipe = _pipe
+
+    _patch(ODAData, "load_indicator", "ODAData.load_indicator")
+    _patch(ODAData, "get_data", "ODAData.get_data")
+    _patch(oda_reader, "download_dac1", "oda_reader.download_dac1")
+    _patch(oda_reader, "download_dac2a", "oda_reader.download_dac2a")
+
+    atexit.register(write_report)
+    logger.info("Profiling enabled")
+
+
+def disable_profiling() -> None:
+    """Restore the original functions."""
+    for (owner, attribute), original in _ORIGINALS.items():
+        setattr(owner, attribute, original)
+
+    _ORIGINALS.clear()
+    atexit.unregister(write_report)
+
+
+def clear_records() -> None:
+    _RECORDS.clear()
+
+
+def summary() -> pd.DataFrame:
+    """Total time, calls, rows and peak memory for each stage, slowest first."""
+    return (
+        pd.DataFrame(_RECORDS, columns=["stage", "seconds", "rows_out", "memory_out"])
+        .groupby("stage")
+        .agg(
+            calls=("seconds", "size"),
+            seconds=("seconds", "sum"),
+            max_rows=("rows_out", "max"),
+            peak_memory=("memory_out", "max"),
+        )
+        .sort_values("seconds", ascending=False)
+        .reset_index()
+    )
+
+
+def _folded_stacks() -> list[str]:
+    """Stacks in the collapsed format used by flamegraph tools (self time, in
+    microseconds)."""
+    total = defaultdict(float)
+    children = defaultdict(float)
+
+    for record in _RECORDS:
+        total[record["stack"]] += record["seconds"]
+        if ";" in record["stack"]:
+            children[record["stack"].rsplit(";", 1)[0]] += record["seconds"]
+
+    return [
+        f"{stack} {max(round(1e6 * (seconds - children[stack])), 0)}"
+        for stack, seconds in sorted(total.items())
+    ]
+
+
+def write_report(name: str | None = None) -> None:
+    """Write the recorded stages as JSON, plus a .folded file for flamegraphs."""
+    if not _RECORDS:
+        return
+
+    name = name or f"{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}"
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+
+    with open(PROFILE_DIR / f"{name}.json", "w") as f:
+        json.dump(
+            {
+                "pid": os.getpid(),
+                "stages": json.loads(summary().to_json(orient="records")),
+                "records": _RECORDS,
+            },
+            f,
+            indent=2,
+            default=str,
+        )
+
+    with open(PROFILE_DIR / f"{name}.folded", "w") as f:
+        f.write("\n".join(_folded_stacks()) + "\n")
+
+    logger.info(f"Profile written to {PROFILE_DIR / name}.json")
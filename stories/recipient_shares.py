@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from oda_reader.schemas.dac2_translation import area_code_mapping
+
+from stories.dac_cache import planned_download_dac1, planned_download_dac2a
+
+# SDMX codes for the EU Institutions and for all developing countries (the
+# denominator of the shares)
+EU_INSTITUTIONS: str = "4EU001"
+DEVELOPING_COUNTRIES: str = "DPGC"
+
+# DAC2A measures: bilateral and imputed multilateral net ODA
+BILATERAL: str = "206"
+IMPUTED_MULTILATERAL: str = "106"
+
+
+def _dotstat_code(code: str) -> int:
+    """.stat code for an SDMX area code (as in the downloaded data)."""
+    return {v: k for k, v in area_code_mapping().items()}[code]
+
+
+def _as_list(value: str | list[str]) -> list[str]:
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def flow_filters(recipients: list[str], donors: str | list[str] | None) -> dict:
+    """DAC2A filters for the flows from the donors and the EU Institutions to the
+    recipients and to all developing countries. All donors if `donors` is None."""
+    filters = {
+        "recipient": [*recipients, DEVELOPING_COUNTRIES],
+        "measure": [IMPUTED_MULTILATERAL, BILATERAL],
+        "price_base": "V",
+        "unit_measure": "USD",
+    }
+
+    if donors is not None:
+        filters["donor"] = [*_as_list(donors), EU_INSTITUTIONS]
+
+    return filters
+
+
+def eui_contribution_filters(donors: str | list[str] | None) -> dict:
+    """DAC1 filters for the core contributions of the donors to the EU Institutions.
+    All donors if `donors` is None."""
+    filters = {
+        "flow_type": "1120",
+        "measure": "2102",
+        "price_base": "V",
+        "unit_measure": "USD",
+    }
+
+    if donors is not None:
+        filters["donor"] = _as_list(donors)
+
+    return filters
+
+
+def recipient_shares(
+    recipients: list[str],
+    donors: str | list[str] | None = None,
+    donor_codes: list[int] | None = None,
+    start_year: int | None = None,
+    dac2a_plan: list[dict] | None = None,
+    dac1_plan: list[dict] | None = None,
+    clip: bool = True,
+) -> pd.DataFrame:
+    """Net ODA from a donor group plus the EU Institutions to each recipient and
+    to all developing countries, and each recipient's share (%) of the total.
+
+    The donor group is given by the SDMX `donors` filter (e.g. "G7", or None for
+    all donors), optionally narrowed to the .stat `donor_codes` (e.g. EU27).
+    Imputed multilateral flows exclude the part of the EU Institutions' spending
+    paid for by the group's contributions (split between recipients like the EU
+    Institutions' bilateral spending), and are clipped at zero if `clip`.
+
+    All recipients come from a single DAC2A query and a single DAC1 query (shared
+    with the other slices of a story if its plans are given), so adding a
+    recipient adds columns rather than downloads.
+    """
+    flow_query = flow_filters(recipients, donors)
+    flows = planned_download_dac2a(
+        flow_query, plan=dac2a_plan or [flow_query], start_year=start_year
+    )
+
+    eui_query = eui_contribution_filters(donors)
+    contributions = planned_download_dac1(
+        eui_query, plan=dac1_plan or [eui_query], start_year=start_year
+    )
+
+    eui = _dotstat_code(EU_INSTITUTIONS)
+    developing = _dotstat_code(DEVELOPING_COUNTRIES)
+
+    if donor_codes is not None:
+        flows = flows.loc[lambda d: d.donor_code.isin([*donor_codes, eui])]
+        contributions = contributions.loc[lambda d: d.donor_code.isin(donor_codes)]
+
+    names = flows.drop_duplicates("recipient_code").set_index("recipient_code")[
+        "recipient_name"
+    ]
+
+    # One row per year and recipient, one column per source and measure
+    wide = (
+        flows.assign(
+            source=lambda d: np.where(d.donor_code == eui, "eui", "group"),
+            measure=lambda d: d.aidtype_code.astype(str),
+        )
+        .pivot_table(
+            index=["year", "recipient_code"],
+            columns=["source", "measure"],
+            values="value",
+            aggfunc="sum",
+            fill_value=0,
+        )
+        .reindex(
+            columns=pd.MultiIndex.from_product(
+                [["group", "eui"], [BILATERAL, IMPUTED_MULTILATERAL]]
+            ),
+            fill_value=0,
+        )
+    )
+
+    year = wide.index.get_level_values("year")
+    is_developing = wide.index.get_level_values("recipient_code") == developing
+
+    # Share of the EU Institutions' bilateral spending going to each recipient
+    eui_bilateral = wide["eui", BILATERAL]
+    eui_share = eui_bilateral.div(
+        eui_bilateral.loc[is_developing].droplevel("recipient_code"), level="year"
+    )
+    eui_share = np.where(is_developing, 1.0, eui_share.fillna(0).to_numpy())
+
+    to_eui = contributions.groupby("year")["value"].sum()
+    to_eui = to_eui.reindex(year, fill_value=0).to_numpy()
+
+    # The EU Institutions' imputed multilateral flows are only added for the
+    # recipients, not for all developing countries
+    imputed = (
+        wide["group", IMPUTED_MULTILATERAL]
+        + wide["eui", IMPUTED_MULTILATERAL].where(~is_developing, 0)
+        - to_eui * eui_share
+    )
+
+    if clip:
+        imputed = imputed.clip(lower=0)
+
+    values = (
+        (wide["group", BILATERAL] + wide["eui", BILATERAL] + imputed)
+        .unstack("recipient_code")
+        .rename(columns=names)
+    )
+    values = values.reindex(columns=sorted(values.columns))
+
+    shares = (
+        values.drop(columns=names[developing])
+        .div(values[names[developing]], axis=0)
+        .mul(100)
+        .round(2)
+        .add_suffix(" share")
+    )
+
+    return pd.concat([values, shares], axis=1).rename_axis(columns=None).reset_index()
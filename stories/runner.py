@@ -0,0 +1,293 @@
+import importlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from stories.config import Paths, logger
+from stories.dac_cache import log_run_cache_stats, reset_run_cache_stats
+from stories.fingerprints import (
+    is_up_to_date,
+    load_manifest,
+    output_fingerprint,
+    save_manifest,
+)
+from stories.health_oda.cube import SOURCE_FILES as HEALTH_SOURCE_FILES
+from stories.profiling import (
+    ENV_VAR,
+    clear_records,
+    enable_profiling,
+    profiling_enabled,
+    run_stage,
+    write_report,
+)
+
+# Modules with output-producing (`export_*`) functions
+STORY_MODULES: list[str] = [
+    "stories.health_oda.trends",
+    "stories.health_oda.multi_vs_bi",
+    "stories.health_oda.g7",
+    "stories.aid_to_africa.g7_plus_eui",
+    "stories.eu27_targets.oda",
+    "stories.eu27_targets.oda_projections",
+    "stories.eu27_targets.ukraine",
+]
+
+# Expensive inputs and the outputs that use them. Outputs sharing an input run
+# one after the other in the same process, so the input is only loaded once.
+SHARED_INPUTS: dict[str, list[str]] = {
+    "health_crs_bilateral": [
+        "stories.health_oda.trends:export_total_health_oda_trend",
+        "stories.health_oda.trends:export_health_share_trend",
+        "stories.health_oda.trends:export_pre_post_covid_trend",
+        "stories.health_oda.trends:export_health_with_without_covid",
+        "stories.health_oda.multi_vs_bi:export_bilat_vs_multilat",
+        "stories.health_oda.multi_vs_bi:export_top5_multi",
+        "stories.health_oda.g7:export_g7_health_share_trend",
+    ],
+    "dac_g7_eui_plan": [
+        "stories.aid_to_africa.g7_plus_eui:export_g7_eui_africa_share",
+        "stories.aid_to_africa.g7_plus_eui:export_eu_africa_share",
+    ],
+    "eu27_oda_gni": [
+        "stories.eu27_targets.oda_projections:export_spending_targets_by_country",
+        "stories.eu27_targets.oda_projections:export_scenario_totals",
+    ],
+    "dac_ukraine_plan": [
+        "stories.eu27_targets.ukraine:export_eu_ukr",
+    ],
+}
+
+# Raw files (globs relative to raw_data) read by each input
+INPUT_FILES: dict[str, list[str]] = {
+    "health_crs_bilateral": [*HEALTH_SOURCE_FILES, "deflator_factors/*"],
+    "dac_g7_eui_plan": ["data_updates.json", "dac_cache/*/*.parquet"],
+    "eu27_oda_gni": [
+        "table1_raw*.feather",
+        "table2a_raw*.feather",
+        "pydeflate_dac1.feather",
+        "deflator_factors/*",
+        "weo_cache/*/*.parquet",
+    ],
+    "dac_ukraine_plan": [
+        "data_updates.json",
+        "dac_cache/*/*.parquet",
+        "pydeflate_dac1.feather",
+    ],
+}
+
+_GNI_TARGETS = "individual_gni_targets_2018_2034_target_2030"
+
+# Files written by each output
+OUTPUT_FILES: dict[str, list[Path]] = {
+    "stories.health_oda.trends:export_total_health_oda_trend": [
+        Paths.health_oda / "total_health_oda_trend.csv"
+    ],
+    "stories.health_oda.trends:export_health_share_trend": [
+        Paths.health_oda / "health_share_trend.csv"
+    ],
+    "stories.health_oda.trends:export_pre_post_covid_trend": [
+        Paths.health_oda / "pre_post_covid_trend.csv"
+    ],
+    "stories.health_oda.trends:export_health_with_without_covid": [
+        Paths.health_oda / "health_with_without_covid.csv"
+    ],
+    "stories.health_oda.multi_vs_bi:export_bilat_vs_multilat": [
+        Paths.health_oda / "bilat_vs_multilat.csv"
+    ],
+    "stories.health_oda.multi_vs_bi:export_top5_multi": [
+        Paths.health_oda / "top5_multi.csv"
+    ],
+    "stories.health_oda.g7:export_g7_health_share_trend": [
+        Paths.health_oda / "g7_health_share_trend.csv"
+    ],
+    "stories.aid_to_africa.g7_plus_eui:export_g7_eui_africa_share": [
+        Paths.aid_to_africa_output / "g7_eui_africa_share.csv"
+    ],
+    "stories.aid_to_africa.g7_plus_eui:export_eu_africa_share": [
+        Paths.aid_to_africa_output / "eu_africa_share.csv"
+    ],
+    "stories.eu27_targets.oda:export_targets": [Paths.eu_project_data / "targets.json"],
+    "stories.eu27_targets.oda_projections:export_spending_targets_by_country": [
+        Paths.eu_project_data / f"{_GNI_TARGETS}.csv",
+        Paths.eu_project_data / f"{_GNI_TARGETS}_flourish.csv",
+        Paths.eu_project_data / "spending_amounts_by_country_flourish.csv",
+    ],
+    "stories.eu27_targets.oda_projections:export_scenario_totals": [
+        Paths.eu_project_data / "additional_spending_yearly.csv",
+        Paths.eu_project_data / "scenario_totals.json",
+    ],
+    "stories.eu27_targets.ukraine:export_eu_ukr": [
+        Paths.eu_project_data / "eu_ukr.csv"
+    ],
+}
+
+
+def find_outputs() -> list[str]:
+    """Return every `export_*` function in the story modules, as 'module:function'."""
+    outputs = []
+
+    for module_name in STORY_MODULES:
+        module = importlib.import_module(module_name)
+        outputs.extend(
+            f"{module_name}:{name}"
+            for name, obj in vars(module).items()
+            if name.startswith("export_")
+            and callable(obj)
+            and obj.__module__ == module_name
+        )
+
+    return outputs
+
+
+def build_chains(outputs: list[str]) -> list[list[str]]:
+    """Group outputs that share an input (directly or through another output)
+    into chains. Chains are independent of each other."""
+    unknown = {o for used_by in SHARED_INPUTS.values() for o in used_by} - set(outputs)
+    if unknown:
+        raise ValueError(f"Unknown outputs in SHARED_INPUTS: {sorted(unknown)}")
+
+    # Outputs without known files could never be skipped as up to date
+    unlisted = [output for output in outputs if output not in OUTPUT_FILES]
+    if unlisted:
+        raise ValueError(f"Outputs missing from OUTPUT_FILES: {unlisted}")
+
+    # Union-find over the outputs, joining the outputs of each shared input
+    parent = {output: output for output in outputs}
+
+    def root(output: str) -> str:
+        while parent[output] != output:
+            output = parent[output]
+        return output
+
+    for used_by in SHARED_INPUTS.values():
+        used_by = [o for o in used_by if o in parent]
+        for output in used_by[1:]:
+            parent[root(output)] = root(used_by[0])
+
+    chains: dict[str, list[str]] = {}
+    for output in outputs:
+        chains.setdefault(root(output), []).append(output)
+
+    # Start the longest chains first
+    return sorted(chains.values(), key=len, reverse=True)
+
+
+def run_chain(chain: list[str]) -> list[tuple[str, float]]:
+    """Run the outputs in a chain, in order. Returns the seconds taken by each."""
+    timings = []
+
+    for output in chain:
+        module_name, function = output.split(":")
+        func = getattr(importlib.import_module(module_name), function)
+        start = time.perf_counter()
+
+        # Count the run cache hits and misses of each output on its own. The
+        # frames are kept, so later outputs in the chain still reuse them.
+        reset_run_cache_stats()
+
+        if profiling_enabled():
+            run_stage(output, func)
+        else:
+            func()
+
+        log_run_cache_stats(output)
+        timings.append((output, time.perf_counter() - start))
+
+    # Worker processes don't run exit handlers, so write the profile here
+    if profiling_enabled():
+        write_report(f"{time.strftime('%Y%m%d_%H%M%S')}_{chain[0].split(':')[1]}")
+        clear_records()
+
+    return timings
+
+
+def _output_files(output: str) -> list[str]:
+    """Files written by an output, relative to the project folder."""
+    return [str(f.relative_to(Paths.project)) for f in OUTPUT_FILES.get(output, [])]
+
+
+def fingerprint(output: str) -> str:
+    """Fingerprint of an output, from its code and the raw files of its inputs."""
+    patterns = [
+        pattern
+        for name, used_by in SHARED_INPUTS.items()
+        if output in used_by
+        for pattern in INPUT_FILES.get(name, [])
+    ]
+    return output_fingerprint(output, patterns)
+
+
+def stale_outputs(outputs: list[str]) -> list[str]:
+    """Outputs whose files are missing or were built from different code or data."""
+    manifest = load_manifest()
+
+    return [
+        output
+        for output in outputs
+        if not is_up_to_date(_output_files(output), fingerprint(output), manifest)
+    ]
+
+
+def run(
+    only: list[str] | None = None,
+    workers: int | None = None,
+    force: bool = False,
+    profile: bool = False,
+) -> None:
+    """Regenerate the story outputs, running independent chains in parallel.
+
+    Outputs are skipped when their fingerprint hasn't changed since they were
+    last built, unless `force` is True.
+
+    Args:
+        only: if given, only outputs whose name contains one of these strings run.
+        workers: number of processes. With 1, the chains run in this process.
+        force: rebuild the outputs even if they are up to date.
+        profile: record the time, rows and memory of every stage, and write a
+            report per chain to output/profiles.
+    """
+    if profile:
+        # Also picked up by worker processes that import stories.config
+        os.environ[ENV_VAR] = "1"
+        enable_profiling()
+
+    chains = build_chains(find_outputs())
+
+    if only:
+        chains = [
+            [o for o in chain if any(name in o for name in only)] for chain in chains
+        ]
+
+    if not force:
+        stale = set(stale_outputs([o for chain in chains for o in chain]))
+        chains = [[o for o in chain if o in stale] for chain in chains]
+
+    chains = [chain for chain in chains if chain]
+
+    if not chains:
+        logger.info("All outputs are up to date")
+        return
+
+    workers = workers or min(len(chains), os.cpu_count() or 1)
+
+    logger.info(
+        f"Running {sum(len(c) for c in chains)} outputs in {len(chains)} chains"
+    )
+    start = time.perf_counter()
+
+    if workers == 1:
+        results = [run_chain(chain) for chain in chains]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_chain, chain) for chain in chains]
+            results = [future.result() for future in as_completed(futures)]
+
+    built = {}
+    for output, seconds in (t for timings in results for t in timings):
+        logger.info(f"{output}: {seconds:.1f}s")
+        built |= dict.fromkeys(_output_files(output), fingerprint(output))
+
+    save_manifest(built)
+
+    logger.info(f"All outputs done in {time.perf_counter() - start:.1f}s")
@@ -1,19 +1,14 @@
 from bblocks import (
-    WorldEconomicOutlook,
     set_bblocks_data_path,
     add_short_names_column,
     convert_id,
 )
 
 from stories import config
+from stories.weo import weo_indicator
 
 set_bblocks_data_path(config.Paths.raw_data)
 
-
-weo = WorldEconomicOutlook()
-
-print(weo.available_indicators())
-
 # INTEREST = (OVERALL_FISCAL_BALANCE, "-", PRIMARY_BALANCE)
 
 OVERALL_FISCAL_BALANCE = "GGXCNL_NGDP"
@@ -24,11 +19,9 @@ GG_NET_DEBT = "GGXWDN_NGDP"
 G7 = ["CAN", "DEU", "FRA", "ITA", "JPN", "GBR", "USA"]
 
 
-weo.load_data([OVERALL_FISCAL_BALANCE, PRIMARY_BALANCE, GG_NET_DEBT])
-
-overall = weo.get_data(OVERALL_FISCAL_BALANCE).query("year.dt.year == 2023")
-primary = weo.get_data(PRIMARY_BALANCE).query("year.dt.year == 2023")
-debt = weo.get_data(GG_NET_DEBT).query("year.dt.year == 2023")
+overall = weo_indicator(OVERALL_FISCAL_BALANCE).query("year.dt.year == 2023")
+primary = weo_indicator(PRIMARY_BALANCE).query("year.dt.year == 2023")
+debt = weo_indicator(GG_NET_DEBT).query("year.dt.year == 2023")
 
 df = overall.merge(primary, on=["iso_code", "year"], suffixes=("_overall", "_primary"))
 df["Interest Payments"] = round(df.value_overall - df.value_primary, 2)
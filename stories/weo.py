@@ -0,0 +1,119 @@
+import json
+import shutil
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+from bblocks import set_bblocks_data_path, WorldEconomicOutlook
+from imf_reader import weo as imf_weo
+from imf_reader.weo.reader import gen_latest_version
+
+from stories.config import Paths, logger
+
+set_bblocks_data_path(Paths.raw_data)
+
+CACHE_DIR: Path = Paths.raw_data / "weo_cache"
+
+# The vintage of the WEO data last loaded
+VINTAGE_FILE: Path = CACHE_DIR / "vintage.json"
+
+# WEO releases, as given by bblocks (1 or 2) or imf_reader ("April", "October")
+RELEASES: dict = {1: "April", 2: "October", "April": "April", "October": "October"}
+
+# Indicators already loaded during this run
+_INDICATORS: dict[str, pd.DataFrame] = {}
+
+
+def _expected_vintage() -> str:
+    """The latest WEO vintage expected for today's date, e.g. '2024_October'."""
+    release, year = gen_latest_version()
+    return f"{year}_{RELEASES[release]}"
+
+
+@lru_cache
+def _weo() -> WorldEconomicOutlook:
+    """A single WorldEconomicOutlook object, only created (and parsed) when an
+    indicator is not already cached on disk."""
+    return WorldEconomicOutlook()
+
+
+def _loaded_vintage(weo: WorldEconomicOutlook) -> str:
+    """The vintage of the data in a loaded WorldEconomicOutlook object. When the
+    expected release is not out yet, imf_reader fetches the previous one."""
+    release, year = getattr(imf_weo.fetch_data, "last_version_fetched", None) or (
+        weo.release,
+        weo.year,
+    )
+    return f"{year}_{RELEASES[release]}"
+
+
+def _recorded_vintage() -> str | None:
+    """The vintage recorded when the WEO was last loaded, if it is still the
+    expected one. Otherwise the WEO is loaded again, to check for a new release."""
+    if not VINTAGE_FILE.exists():
+        return None
+
+    with open(VINTAGE_FILE, "r") as f:
+        vintage = json.load(f)["vintage"]
+
+    return vintage if vintage == _expected_vintage() else None
+
+
+@lru_cache
+def weo_vintage() -> str:
+    """Return the vintage of the WEO data used, e.g. '2024_October', as reported
+    when the data was loaded."""
+    vintage = _recorded_vintage()
+
+    if vintage is None:
+        weo = _weo().load_data("NGDP_D")
+        vintage = _loaded_vintage(weo)
+        logger.info(f"Using WEO vintage {vintage}")
+
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(VINTAGE_FILE, "w") as f:
+            json.dump({"vintage": vintage}, f)
+
+    return vintage
+
+
+def _vintage_dir() -> Path:
+    """Folder for the current vintage. Folders for older vintages are removed."""
+    vintage = weo_vintage()
+    folder = CACHE_DIR / vintage
+
+    for old in CACHE_DIR.iterdir():
+        if old.is_dir() and old.name != vintage:
+            logger.info(f"Removing WEO cache for vintage {old.name}")
+            shutil.rmtree(old)
+
+    folder.mkdir(parents=True, exist_ok=True)
+
+    return folder
+
+
+def weo_indicator(indicator: str) -> pd.DataFrame:
+    """Return the data for a WEO indicator, as `WorldEconomicOutlook.get_data`.
+
+    Each indicator is saved as parquet under the vintage of the loaded WEO data,
+    so the WEO release is only parsed the first time an indicator is requested.
+    Callers receive a copy of the data.
+    """
+    if indicator not in _INDICATORS:
+        path = _vintage_dir() / f"{indicator}.parquet"
+
+        if path.exists():
+            logger.debug(f"Loading WEO {indicator} from cache")
+            df = pd.read_parquet(path)
+        else:
+            df = _weo().load_data(indicator).get_data(indicator)
+            df.to_parquet(path, index=False)
+
+        _INDICATORS[indicator] = df
+
+    return _INDICATORS[indicator].copy()
+
+
+def weo_indicators(indicators: list[str]) -> pd.DataFrame:
+    """Return the data for several WEO indicators in a single dataframe."""
+    return pd.concat([weo_indicator(i) for i in indicators], ignore_index=True)